@@ -13,6 +13,16 @@ def create_app(config_class=Config):
 
     # Initialize extensions here if any exist later
 
+    # Pre-build shared Gemini clients so the first request skips setup
+    from app.services.model_registry import model_registry
+    with app.app_context():
+        model_registry.warm(app.config.get('GEMINI_WARM_MODELS', []))
+
+    # Resolve the Gemini model (disk cache or discovery) before the first request
+    if app.config.get('GEMINI_EAGER_WARMUP'):
+        from app.services.gemini_service import GeminiService
+        GeminiService.warm_up(app)
+
     # Register Blueprints
     from app.routes.main_routes import main_bp
     app.register_blueprint(main_bp)
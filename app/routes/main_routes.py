@@ -1,12 +1,39 @@
 
-from flask import Blueprint, request, jsonify, render_template, current_app, send_from_directory
+from flask import Blueprint, request, jsonify, render_template, current_app, send_from_directory, Response, stream_with_context, g, abort, send_file
 from app.services.chat_manager import chat_manager
 from app.services.mentor_service import MentorService
 from app.services.pdf_manager import PDFManager
+from app.services.job_manager import job_manager
+from app.services.metrics import metrics
+from app.services.pdf_export import pdf_exporter
 import os
+import json
+import re
+import time
 
 main_bp = Blueprint('main', __name__)
 
+@main_bp.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+@main_bp.after_request
+def _record_request(response):
+    # For streamed responses this is the time until headers are sent, not the full stream
+    started = g.pop('request_started', None)
+    if started is not None and request.endpoint != 'main.metrics_endpoint':
+        metrics.http_requests.observe(
+            time.perf_counter() - started,
+            endpoint=request.endpoint or 'unknown', method=request.method, status=response.status_code,
+        )
+    return response
+
+@main_bp.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    if not current_app.config.get('METRICS_ENABLED'):
+        abort(404)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @main_bp.route('/')
 def index():
     return render_template('index.html')
@@ -21,26 +48,39 @@ def upload_file():
         return jsonify({'reply': 'No file selected'}), 400
 
     user_id = request.remote_addr
-    state = chat_manager.get_state(user_id)
 
     if file and file.filename.lower().endswith('.pdf'):
-        # Process the PDF directly with the file object
-        file_bytes = file.read()
-        pdf_text = PDFManager.extract_text(file_bytes)
-        
-        # Update state with PDF context
-        state.loaded_file_path = file.filename
-        state.pdf_text = pdf_text
+        # Process the PDF outside the session lock. Spooled uploads are kept on disk and
+        # read page by page when needed, so the request returns without extracting
+        # anything; the retrieval index is built in the background. A PDF already in
+        # the shared corpus (uploaded by anyone) is not processed again.
+        if current_app.config.get('UPLOAD_SPOOL'):
+            spool_path, content_hash = PDFManager.spool_upload(file.stream)
+            try:
+                document = PDFManager.open_spooled(spool_path, content_hash)
+            except Exception:
+                if os.path.exists(spool_path):
+                    os.remove(spool_path)
+                raise
+            PDFManager.index_in_background(document)
+        else:
+            document = PDFManager.open_document(file.read())
+            document.index  # Build the shared retrieval index before taking the session
 
         # Determine type for smarter prompts later
         if 'resume' in file.filename.lower():
-            state.loaded_file_type = "resume"
+            file_type = "resume"
             response = "✅ Resume uploaded. You can ask me to 'Analyze this' for detailed feedback."
         else:
-            state.loaded_file_type = "pdf"
+            file_type = "pdf"
             response = "✅ Document uploaded. Detailed analysis mode active."
 
-        state.add_to_history("upload " + file.filename, response)
+        # Add to the session's workspace; earlier documents stay available
+        with chat_manager.session(user_id, durable=True) as state:
+            state.add_document(file.filename, document, file_type)
+            if len(state.documents) > 1:
+                response += f" ({len(state.documents)} documents in your workspace; questions search all of them.)"
+            state.add_to_history("upload " + file.filename, response)
         return jsonify({'reply': response})
 
     return jsonify({'reply': "⚠️ Please upload a valid PDF file."}), 400
@@ -54,13 +94,147 @@ def chat():
     if not user_message:
         return jsonify({'reply': 'Please provide a message.'}), 400
 
-    # Get or create user state
-    state = chat_manager.get_state(user_id)
-
-    # Process via MentorService (The Brain)
-    bot_response = MentorService.process_request(user_message, state)
-    
-    # Update History
-    state.add_to_history(user_message, bot_response)
+    # Get or create user state; turns from the same user are serialized
+    with chat_manager.session(user_id) as state:
+        # Process via MentorService (The Brain)
+        bot_response = MentorService.process_request(user_message, state)
+        
+        # Update History
+        state.add_to_history(user_message, bot_response)
 
     return jsonify({'reply': bot_response})
+
+@main_bp.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    data = request.json
+    user_message = data.get('message', '')
+    user_id = request.remote_addr
+
+    if not user_message:
+        return jsonify({'reply': 'Please provide a message.'}), 400
+
+    def generate():
+        # Server-Sent Events: one `data:` frame per chunk, then a `done` event.
+        # The session is held for the whole stream so turns cannot interleave.
+        with chat_manager.session(user_id) as state:
+            parts = []
+            for chunk in MentorService.stream_request(user_message, state):
+                parts.append(chunk)
+                yield f"data: {json.dumps({'chunk': chunk})}\n\n"
+
+            bot_response = "".join(parts)
+            state.add_to_history(user_message, bot_response)
+        yield f"event: done\ndata: {json.dumps({'reply': bot_response})}\n\n"
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+
+def _build_job(task: str, data: dict, state):
+    """Returns the callable for a background job, or None for an unknown task."""
+    # Snapshot session data now, so later uploads do not change a queued job
+    # (the Document itself, not its text, so big PDFs are read page by page in the job)
+    document = state.active_ref.document if state.documents else None
+    doc_type = "resume" if state.loaded_file_type == "resume" else "general"
+    focus = data.get('focus')
+    content = data.get('content')
+
+    if task == 'analyze_document':
+        return lambda job: MentorService.analyze_document(document, doc_type)
+    if task == 'generate_summary':
+        return lambda job: PDFManager.generate_summary(document)
+    if task == 'generate_notes':
+        return lambda job: PDFManager.generate_notes(document, focus)
+    if task == 'generate_summary_pdf':
+        def summary_pdf(job):
+            summary = content
+            if not summary:
+                summary = PDFManager.generate_summary(document)
+                job.set_progress(0.5)
+            return PDFManager.generate_summary_pdf(summary)
+        return summary_pdf
+    return None
+
+@main_bp.route('/jobs', methods=['POST'])
+def create_job():
+    data = request.json or {}
+    task = data.get('task', '')
+    user_id = request.remote_addr
+
+    with chat_manager.session_lock(user_id):
+        state = chat_manager.get_state(user_id)
+
+        if task != 'generate_summary_pdf' or not data.get('content'):
+            if not state.documents or state.active_ref.document.char_count == 0:
+                return jsonify({'reply': '❌ No PDF content available. Please upload a PDF first.'}), 400
+
+        fn = _build_job(task, data, state)
+    if fn is None:
+        return jsonify({'reply': f"Unknown task '{task}'."}), 400
+
+    job = job_manager.submit(task, user_id, fn, app=current_app._get_current_object())
+    return jsonify(job.to_dict()), 202
+
+@main_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_manager.get(job_id, owner=request.remote_addr)
+    if job is None:
+        return jsonify({'reply': 'Job not found.'}), 404
+    return jsonify(job.to_dict())
+
+_EXPORT_KEY = re.compile(r'^[0-9a-f]{64}$')
+
+@main_bp.route('/exports', methods=['POST'])
+def create_export():
+    data = request.json or {}
+    content = data.get('content', '')
+    if not content or not content.strip():
+        return jsonify({'reply': '❌ No content to export.'}), 400
+
+    # Rendering happens on the export pool; the client polls or downloads the URL
+    try:
+        key, future = pdf_exporter.submit(content)
+        failed = future.done() and future.exception() is not None
+    except Exception as e:
+        # e.g. the export pool broke and could not be restarted
+        current_app.logger.error(f"Could not start PDF export: {e}")
+        failed = True
+    if failed:
+        return jsonify({'reply': '⚠️ Could not export the PDF right now. Please try again.'}), 503
+    status = 'ready' if future.done() else 'pending'
+    return jsonify({'id': key, 'status': status, 'url': pdf_exporter.download_url(key)}), 200 if status == 'ready' else 202
+
+@main_bp.route('/exports/<key>', methods=['GET'])
+def download_export(key):
+    if not _EXPORT_KEY.match(key):
+        return jsonify({'reply': 'Export not found.'}), 404
+
+    path = pdf_exporter.open_ready(key)
+    if path is None:
+        if pdf_exporter.status(key) == 'pending':
+            return jsonify({'id': key, 'status': 'pending'}), 202
+        return jsonify({'reply': 'Export not found.'}), 404
+
+    # send_file streams the file in blocks and supports conditional/range requests
+    return send_file(path, mimetype='application/pdf', as_attachment=True,
+                     download_name=f"summary_{key[:12]}.pdf", max_age=3600)
+
+@main_bp.route('/documents', methods=['GET'])
+def list_documents():
+    with chat_manager.session_lock(request.remote_addr):
+        state = chat_manager.get_state(request.remote_addr)
+        return jsonify({'documents': state.list_documents(), 'active': state.active_document})
+
+@main_bp.route('/documents/active', methods=['POST'])
+def select_document():
+    name = (request.json or {}).get('name', '')
+    with chat_manager.session(request.remote_addr, durable=True) as state:
+        if not state.select_document(name):
+            return jsonify({'reply': f"❌ No document named '{name}' in your workspace."}), 404
+        return jsonify({'reply': f"✅ Now working with {name}.", 'active': name})
+
+@main_bp.route('/documents/<path:name>', methods=['DELETE'])
+def remove_document(name):
+    with chat_manager.session(request.remote_addr, durable=True) as state:
+        if not state.remove_document(name):
+            return jsonify({'reply': f"❌ No document named '{name}' in your workspace."}), 404
+        return jsonify({'reply': f"🗑️ Removed {name}.", 'active': state.active_document})
@@ -1,5 +1,6 @@
 
 from app.services.llm import LLMService
+from app.services.intent_router import intent_router
 
 class AdvisoryService:
     
@@ -8,11 +9,13 @@ class AdvisoryService:
         """
         Handle academic-related queries.
         """
-        if "subject" in message:
+        intents = intent_router.match(message)
+
+        if "subject" in intents:
             prompt = f"As an academic advisor, help with this subject-related query: {message}"
-        elif "timetable" in message or "schedule" in message:
+        elif "schedule" in intents:
             prompt = f"As an academic advisor, help create a study schedule for: {message}"
-        elif "backlog" in message:
+        elif "backlog" in intents:
             prompt = f"As an academic advisor, provide guidance on managing academic backlogs: {message}"
         else:
             prompt = f"As an academic advisor, provide guidance on: {message}"
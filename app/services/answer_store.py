@@ -0,0 +1,166 @@
+import threading
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from config import Config
+from app.services.document_index import tokenize
+from app.services.llm import LLMService
+
+AnswerKey = Tuple[str, str]  # (intent, domain)
+
+# (intent, domain, producer, phrasings students actually use).
+# Producers are the LLMService canned-response generators; each runs once at build time.
+ANSWER_SPECS: List[Tuple[str, str, Callable[[], str], List[str]]] = [
+    ('career', 'software', lambda: LLMService.enhanced_career_query("software roadmap")[0], [
+        "software development roadmap", "software developer career path", "programming career roadmap",
+        "how to become a software developer", "software engineer roadmap",
+    ]),
+    ('career', 'data', lambda: LLMService.enhanced_career_query("data roadmap")[0], [
+        "data science roadmap", "data scientist career path", "how to become a data scientist",
+        "data analytics roadmap", "data analyst career path",
+    ]),
+    ('career', 'job_search', lambda: LLMService.enhanced_career_query("job search")[0], [
+        "job search strategy", "how to find a job", "job search tips", "how do i search for jobs",
+    ]),
+    ('career', 'compensation', lambda: LLMService.enhanced_career_query("salary")[0], [
+        "salary negotiation", "how to negotiate salary", "compensation guide", "salary negotiation tips",
+    ]),
+    ('career', 'general', lambda: LLMService.enhanced_career_query("career")[0], [
+        "career guidance", "career advice", "general career guidance", "help with my career",
+    ]),
+    ('resume', 'format', lambda: LLMService.enhanced_resume_query("format"), [
+        "resume format", "resume template", "how to format my resume", "resume structure",
+    ]),
+    ('resume', 'skills', lambda: LLMService.enhanced_resume_query("skills"), [
+        "resume skills section", "what skills to put on resume", "skills for resume",
+    ]),
+    ('resume', 'experience', lambda: LLMService.enhanced_resume_query("experience"), [
+        "resume work experience", "how to write work experience on resume", "experience section resume",
+    ]),
+    ('resume', 'ats', lambda: LLMService.enhanced_resume_query("ats"), [
+        "ats resume", "ats optimization", "applicant tracking system resume", "ats friendly resume",
+    ]),
+    ('resume', 'general', lambda: LLMService.enhanced_resume_query(""), [
+        "resume tips", "resume advice", "how to write a resume", "general resume tips",
+    ]),
+    ('interview', 'technical', lambda: LLMService.enhanced_interview_query("technical"), [
+        "technical interview preparation", "technical interview tips", "how to prepare for technical interview",
+        "coding interview preparation",
+    ]),
+    ('interview', 'behavioral', lambda: LLMService.enhanced_interview_query("behavioral"), [
+        "behavioral interview preparation", "behavioral interview questions", "star method interview",
+    ]),
+    ('interview', 'questions', lambda: LLMService.enhanced_interview_query("questions ask"), [
+        "questions to ask the interviewer", "what questions should i ask in an interview",
+        "questions to ask in interview",
+    ]),
+    ('interview', 'general', lambda: LLMService.enhanced_interview_query(""), [
+        "interview tips", "interview preparation", "how to prepare for an interview", "interview advice",
+    ]),
+    ('project', 'general', lambda: LLMService.generate_project_response(""), [
+        "project ideas", "suggest some project ideas", "final year project ideas",
+    ]),
+    ('schedule', 'general', lambda: LLMService.generate_schedule_response(""), [
+        "study schedule", "study timetable", "how to make a study schedule", "study schedule tips",
+    ]),
+    ('backlog', 'general', lambda: LLMService.generate_backlog_response(""), [
+        "backlog management", "how to clear backlogs", "how to manage backlogs", "catch up on backlog",
+    ]),
+    ('study', 'general', lambda: LLMService.handle_general_query("study"), [
+        "study tips", "how to study effectively", "academic success tips", "effective study strategies",
+    ]),
+    ('motivation', 'general', lambda: LLMService.handle_general_query("motivation"), [
+        "motivation tips", "how to stop procrastinating", "productivity tips", "how to stay focused",
+    ]),
+]
+
+
+class AnswerStore:
+    """
+    Pre-rendered canned answers keyed by (intent, domain), built once at startup.
+    lookup() serves a question locally when it is a close paraphrase of a known
+    phrasing: exact normalized matches are a dict hit; fuzzy matches use an
+    inverted token index and Jaccard similarity against `threshold`.
+
+    A fuzzy match also needs every word of the question to appear in the phrasings
+    of that answer. Otherwise "how not to become a data scientist" or "data scientist
+    salary in india" would get the roadmap for having most of its words.
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self._answers: Dict[AnswerKey, str] = {}
+        self._exact: Dict[str, AnswerKey] = {}
+        self._phrases: List[Tuple[frozenset, AnswerKey]] = []
+        self._vocabulary: Dict[AnswerKey, Set[str]] = {}  # every token of an answer's phrasings
+        self._postings: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(tokenize(text))
+
+    @classmethod
+    def build(cls, specs, threshold: float) -> "AnswerStore":
+        store = cls(threshold)
+        for intent, domain, producer, phrasings in specs:
+            store.add(intent, domain, producer(), phrasings)
+        return store
+
+    def add(self, intent: str, domain: str, answer: str, phrasings: List[str]) -> None:
+        key = (intent, domain)
+        self._answers[key] = answer
+        for phrase in phrasings:
+            tokens = frozenset(tokenize(phrase))
+            if not tokens:
+                continue
+            self._exact[" ".join(sorted(tokens))] = key
+            self._vocabulary.setdefault(key, set()).update(tokens)
+            phrase_id = len(self._phrases)
+            self._phrases.append((tokens, key))
+            for token in tokens:
+                self._postings.setdefault(token, []).append(phrase_id)
+
+    def get(self, intent: str, domain: str = 'general') -> Optional[str]:
+        return self._answers.get((intent, domain))
+
+    def match(self, message: str) -> Optional[AnswerKey]:
+        """Returns the (intent, domain) of the best phrasing above the threshold, if any."""
+        tokens = frozenset(tokenize(message))
+        if not tokens:
+            return None
+
+        key = self._exact.get(" ".join(sorted(tokens)))
+        if key is not None:
+            return key
+
+        overlaps: Dict[int, int] = {}
+        for token in tokens:
+            for phrase_id in self._postings.get(token, ()):
+                overlaps[phrase_id] = overlaps.get(phrase_id, 0) + 1
+
+        best_key, best_score = None, 0.0
+        for phrase_id, overlap in overlaps.items():
+            phrase_tokens, key = self._phrases[phrase_id]
+            if not tokens <= self._vocabulary[key]:
+                continue  # The question says something this answer does not cover
+            score = overlap / len(tokens | phrase_tokens)
+            if score > best_score:
+                best_key, best_score = key, score
+
+        return best_key if best_score >= self.threshold else None
+
+    def lookup(self, message: str) -> Optional[str]:
+        """Returns a canned answer for message, or None if it should go to the LLM."""
+        key = self.match(message)
+        with self._lock:
+            if key is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return self._answers[key]
+
+
+# Global instance (built once at import / app startup)
+answer_store = AnswerStore.build(ANSWER_SPECS, threshold=Config.STATIC_ANSWER_THRESHOLD)
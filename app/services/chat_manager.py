@@ -1,80 +1,493 @@
 
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from itertools import islice, zip_longest
+from types import MappingProxyType
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Any, Callable, Deque, FrozenSet, Iterator, List, Dict, NamedTuple, Optional, Tuple, Union
+
+from config import Config
+from app.services.document_index import DocumentIndex
+from app.services.document_store import Document, DocumentRef, select_workspace_context
+from app.services.paged_pdf import pdf_store
+from app.services.session_store import SessionBackend, create_session_backend
+
+class HistoryEntry:
+    """
+    One conversation exchange.
+    Stored as a single pre-rendered "User: ...\nAssistant: ..." string (what the
+    prompt needs) plus the offset of the reply, so the messages are not kept twice.
+    """
+
+    __slots__ = ('timestamp', 'rendered', '_reply_start')
+
+    _USER_PREFIX = "User: "
+    _ASSISTANT_PREFIX = "\nAssistant: "
+
+    def __init__(self, user_message: str, bot_response: str, timestamp: Optional[float] = None):
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.rendered = f"{self._USER_PREFIX}{user_message}{self._ASSISTANT_PREFIX}{bot_response}"
+        self._reply_start = len(self._USER_PREFIX) + len(user_message) + len(self._ASSISTANT_PREFIX)
+
+    @property
+    def user_message(self) -> str:
+        return self.rendered[len(self._USER_PREFIX):self._reply_start - len(self._ASSISTANT_PREFIX)]
+
+    @property
+    def bot_response(self) -> str:
+        return self.rendered[self._reply_start:]
+
+    def to_dict(self) -> Dict[str, str]:
+        return {
+            'timestamp': datetime.fromtimestamp(self.timestamp).isoformat(),
+            'user_message': self.user_message,
+            'bot_response': self.bot_response,
+        }
+
+
+# Shared stand-in for the history of sessions that have none yet; most sessions are idle
+_NO_HISTORY: Tuple[HistoryEntry, ...] = ()
+# Likewise for documents; most sessions never upload one
+_NO_DOCUMENTS: "MappingProxyType[str, DocumentRef]" = MappingProxyType({})
+
+_UNSET = object()
+
+
+class RecordBase(NamedTuple):
+    """Field values and history/document keys of the stored record a session was based on."""
+    fields: Tuple[Any, ...]
+    history: FrozenSet[Tuple[float, str]]
+    documents: FrozenSet[Tuple[str, str]]
+
+
+def _history_key(entry: List[Any]) -> Tuple[float, str]:
+    return entry[0], entry[1]
+
+
+def _document_key(entry: List[Any]) -> Tuple[str, str]:
+    return entry[0], entry[2]  # file name, document id
+
+
+def _merge_entries(stored: List[list], local: List[list], base: FrozenSet[tuple],
+                   key: Callable[[list], tuple]) -> List[list]:
+    """Entries of both sides, minus those in base that either side has since removed."""
+    stored_keys = {key(entry) for entry in stored}
+    local_keys = {key(entry) for entry in local}
+    merged: "OrderedDict[tuple, list]" = OrderedDict()
+    for entry in stored:
+        if key(entry) in base and key(entry) not in local_keys:
+            continue  # removed here
+        merged[key(entry)] = entry
+    for entry in local:
+        if key(entry) in base and key(entry) not in stored_keys:
+            continue  # removed by the other worker
+        merged.pop(key(entry), None)
+        merged[key(entry)] = entry
+    return list(merged.values())
+
 
 class ChatbotState:
     """
     Manages the state of a chatbot conversation for a specific user.
     Tracks conversation history, user preferences, and context.
+    Slotted and ring-buffered to keep per-session overhead small.
+    Uploaded documents form a workspace of references into the shared corpus;
+    the most recently uploaded or selected one is the active document.
     """
+
+    __slots__ = (
+        'conversation_history', 'last_domain', 'last_llm_topic', 'user_interest_field',
+        'documents', 'active_document',
+        'project_suggested_once', 'resume_outline_pending', 'last_career_domain', 'version', 'base',
+    )
+
+    # Plain fields persisted by session store backends
+    RECORD_FIELDS = (
+        'last_domain', 'last_llm_topic', 'user_interest_field', 'active_document',
+        'project_suggested_once', 'resume_outline_pending', 'last_career_domain',
+    )
+
+    # Keep only recent history to prevent memory issues
+    max_history_length: int = 20
+    max_documents: int = Config.SESSION_MAX_DOCUMENTS
     
     def __init__(self):
-        self.conversation_history: List[Dict[str, str]] = []
+        # The ring buffer is created by the first exchange
+        self.conversation_history: Union[Deque[HistoryEntry], Tuple[HistoryEntry, ...]] = _NO_HISTORY
         self.last_domain: Optional[str] = None
         self.last_llm_topic: Optional[str] = None
         self.user_interest_field: Optional[str] = None
-        self.loaded_file_path: Optional[str] = None
-        self.loaded_file_type: Optional[str] = None
-        self.pdf_text: Optional[str] = None  # Moved from global cached_text
+        # file name -> shared document; the OrderedDict is created by the first upload
+        self.documents: "Union[OrderedDict[str, DocumentRef], MappingProxyType[str, DocumentRef]]" = _NO_DOCUMENTS
+        self.active_document: Optional[str] = None
         self.project_suggested_once: bool = False
         self.resume_outline_pending: bool = False
-        self.max_history_length: int = 20
         self.last_career_domain: Optional[str] = None # From app.py global
-    
+        self.version: int = 0  # Stored version this session is based on (0: never stored)
+        self.base: Optional[RecordBase] = None  # What that stored version held, for merging
+
+    @property
+    def active_ref(self) -> Optional[DocumentRef]:
+        if self.active_document is None:
+            return None
+        return self.documents.get(self.active_document)
+
+    @property
+    def loaded_file_path(self) -> Optional[str]:
+        return self.active_document
+
+    @property
+    def loaded_file_type(self) -> Optional[str]:
+        ref = self.active_ref
+        return ref.file_type if ref else None
+
+    @property
+    def pdf_text(self) -> Optional[str]:
+        """Text of the active document; loaded from the corpus on first access."""
+        ref = self.active_ref
+        return ref.document.text if ref else None
+
+    @property
+    def pdf_index(self) -> Optional[DocumentIndex]:
+        ref = self.active_ref
+        return ref.document.index if ref else None
+
+    def add_document(self, name: str, document: Document, file_type: str) -> None:
+        """Adds (or replaces) a document under name and makes it active; the oldest falls out past the limit."""
+        documents = self._workspace()
+        documents.pop(name, None)
+        documents[name] = DocumentRef(name, file_type, document)
+        self.active_document = name
+        while len(documents) > self.max_documents:
+            documents.popitem(last=False)
+
+    def select_document(self, name: str) -> bool:
+        if name not in self.documents:
+            return False
+        self.active_document = name
+        return True
+
+    def remove_document(self, name: str) -> bool:
+        if name not in self.documents:
+            return False
+        del self.documents[name]
+        if not self.documents:
+            self.documents = _NO_DOCUMENTS
+        if self.active_document == name:
+            self.active_document = next(reversed(self.documents), None)
+        return True
+
+    def list_documents(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                'name': ref.name,
+                'type': ref.file_type,
+                'id': ref.document.doc_id,
+                'characters': ref.document.char_count,
+                'active': ref.name == self.active_document,
+            }
+            for ref in self.documents.values()
+        ]
+
+    def select_context(self, query: str, char_budget: Optional[int] = None) -> Optional[str]:
+        """Most relevant document text for query: the active document first, then the whole workspace."""
+        ref = self.active_ref
+        if ref is None:
+            return None
+        if len(self.documents) == 1:
+            index = ref.document.index
+            if index is None:
+                return None
+            return index.select_context(query, char_budget)
+        return select_workspace_context(list(self.documents.values()), query, char_budget)
+
+    def to_record(self) -> Dict[str, Any]:
+        """JSON-serializable snapshot; documents are stored by id (their text lives in the corpus)."""
+        record: Dict[str, Any] = {field: getattr(self, field) for field in self.RECORD_FIELDS}
+        record['history'] = [
+            [entry.timestamp, entry.user_message, entry.bot_response] for entry in list(self.conversation_history)
+        ]
+        record['documents'] = [
+            [ref.name, ref.file_type, ref.document.doc_id, ref.added_at] for ref in list(self.documents.values())
+        ]
+        return record
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any], version: int,
+                    document_loader: Optional[Callable[[str], Document]] = None) -> "ChatbotState":
+        """Rebuilds a session; document_loader(doc_id) returns the shared (lazy) document."""
+        state = cls()
+        for field in cls.RECORD_FIELDS:
+            if field in record:
+                setattr(state, field, record[field])
+        for timestamp, user_message, bot_response in record.get('history', []):
+            state._history().append(HistoryEntry(user_message, bot_response, timestamp))
+        if document_loader is not None:
+            for name, file_type, doc_id, added_at in record.get('documents', []):
+                state._workspace()[name] = DocumentRef(name, file_type, document_loader(doc_id), added_at)
+        if state.active_document not in state.documents:
+            state.active_document = next(reversed(state.documents), None)
+        state.version = version
+        state.base = cls.record_base(record)
+        return state
+
+    @classmethod
+    def record_base(cls, record: Dict[str, Any]) -> RecordBase:
+        """The parts of a stored record that merge_records compares against."""
+        return RecordBase(
+            tuple(record.get(field) for field in cls.RECORD_FIELDS),
+            frozenset(_history_key(entry) for entry in record.get('history', [])),
+            frozenset(_document_key(entry) for entry in record.get('documents', [])),
+        )
+
+    @classmethod
+    def merge_records(cls, stored: Dict[str, Any], local: Dict[str, Any],
+                      base: Optional[RecordBase] = None) -> Dict[str, Any]:
+        """
+        Three-way merge of a record written by another worker with this worker's copy of
+        the version base was taken from. Each side keeps its own changes: entries removed
+        on either side since base stay removed, fields changed locally win.
+        Without a base (never stored here) nothing counts as removed.
+        """
+        if base is None:
+            base = RecordBase((), frozenset(), frozenset())
+
+        merged = dict(stored)
+        for field, base_value in zip_longest(cls.RECORD_FIELDS, base.fields, fillvalue=_UNSET):
+            if field in local and local[field] != base_value:
+                merged[field] = local[field]
+
+        history = _merge_entries(stored.get('history', []), local.get('history', []), base.history, _history_key)
+        merged['history'] = sorted(history, key=lambda entry: entry[0])[-cls.max_history_length:]
+        documents = _merge_entries(stored.get('documents', []), local.get('documents', []), base.documents,
+                                   _document_key)
+        merged['documents'] = documents[-cls.max_documents:]
+        if merged.get('active_document') not in {entry[0] for entry in merged['documents']}:
+            merged['active_document'] = merged['documents'][-1][0] if merged['documents'] else None
+        return merged
+
     def add_to_history(self, user_message: str, bot_response: str) -> None:
-        """Add a conversation exchange to history."""
-        entry = {
-            'timestamp': datetime.now().isoformat(),
-            'user_message': user_message,
-            'bot_response': bot_response
-        }
-        self.conversation_history.append(entry)
-        
-        # Keep only recent history to prevent memory issues
-        if len(self.conversation_history) > self.max_history_length:
-            self.conversation_history = self.conversation_history[-self.max_history_length:]
+        """Add a conversation exchange to history (the oldest falls off the ring buffer)."""
+        self._history().append(HistoryEntry(user_message, bot_response))
+
+    def _history(self) -> Deque[HistoryEntry]:
+        """The history ring buffer, created on first use."""
+        history = self.conversation_history
+        if history is _NO_HISTORY:
+            history = self.conversation_history = deque(maxlen=self.max_history_length)
+        return history
+
+    def _workspace(self) -> "OrderedDict[str, DocumentRef]":
+        """The documents dict, created on first use."""
+        documents = self.documents
+        if documents is _NO_DOCUMENTS:
+            documents = self.documents = OrderedDict()
+        return documents
     
     def get_recent_context(self, num_exchanges: int = 3) -> str:
         """Get recent conversation context for LLM queries."""
-        if not self.conversation_history:
-            return ""
-        
-        recent_history = self.conversation_history[-num_exchanges:]
-        context_parts = []
-        
-        for entry in recent_history:
-            context_parts.append(f"User: {entry['user_message']}")
-            context_parts.append(f"Assistant: {entry['bot_response']}")
-        
-        return "\n".join(context_parts)
+        return "\n".join(self.get_recent_exchanges(num_exchanges))
+
+    def get_recent_exchanges(self, num_exchanges: int = 3) -> List[str]:
+        """Pre-rendered recent exchanges, oldest first."""
+        if num_exchanges <= 0:
+            return []
+        recent = [entry.rendered for entry in islice(reversed(self.conversation_history), num_exchanges)]
+        recent.reverse()
+        return recent
+    
+    def estimated_size(self) -> int:
+        """
+        Approximate memory held by this session (history + document references), in bytes.
+        Document text is shared and accounted by the corpus instead.
+        """
+        size = 0
+        for entry in self.conversation_history:
+            size += sys.getsizeof(entry.rendered)
+        for name in list(self.documents):
+            size += sys.getsizeof(name) + 64
+        return size
     
     def clear_history(self) -> None:
         """Clear conversation history."""
-        self.conversation_history.clear()
+        self.conversation_history = _NO_HISTORY
     
     def reset_state(self) -> None:
         """Reset all state variables."""
-        self.conversation_history.clear()
+        self.clear_history()
         self.last_domain = None
         self.last_llm_topic = None
         self.user_interest_field = None
-        self.loaded_file_path = None
-        self.loaded_file_type = None
-        self.pdf_text = None
+        self.documents = _NO_DOCUMENTS
+        self.active_document = None
         self.project_suggested_once = False
         self.resume_outline_pending = False
 
 
 class ChatManager:
-    """Singleton-like manager for user states."""
+    """
+    Singleton-like manager for user states.
+    Sessions live in a bounded LRU store: idle sessions expire after a TTL and the
+    least recently used ones are evicted once the entry count or the estimated
+    memory footprint (history + PDF text) exceeds its limit.
+
+    That store is the hot tier in front of a pluggable SessionBackend. Misses are
+    restored from the backend, and a session is reloaded when another worker has
+    stored a newer version of it.
+    """
     
-    def __init__(self):
-        self._user_states: Dict[str, ChatbotState] = {}
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 256 * 1024 * 1024, idle_ttl: float = 3600,
+                 backend: Optional[SessionBackend] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.backend = backend or SessionBackend()
+        self._user_states: "OrderedDict[str, ChatbotState]" = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        # Entries disappear once no thread holds the lock object any more
+        self._session_locks: "weakref.WeakValueDictionary[str, threading.RLock]" = weakref.WeakValueDictionary()
+        self.evictions = 0
+        self.expirations = 0
     
     def get_state(self, user_id: str) -> ChatbotState:
-        if user_id not in self._user_states:
-            self._user_states[user_id] = ChatbotState()
-        return self._user_states[user_id]
+        """
+        Returns the session for user_id, creating or restoring it if needed.
+        The manager's lock only guards the session table; backend I/O runs outside it.
+        Callers that mutate the session should use session() instead.
+        """
+        with self._lock:
+            state = self._user_states.get(user_id)
+
+        fresh = None
+        if state is None:
+            fresh = self.backend.load(user_id) or ChatbotState()
+        else:
+            stored_version = self.backend.version(user_id)
+            if stored_version is not None and stored_version > state.version:
+                # Another worker changed this session since we cached it; keep our unsaved changes
+                fresh = self.backend.load(user_id, unsaved=state)
+
+        now = time.monotonic()
+        with self._lock:
+            self._expire_idle(now)
+
+            current = self._user_states.get(user_id)
+            if fresh is not None and (current is None or current is state):
+                current = fresh
+            elif current is None:
+                # Expired while we were looking it up; keep using the same object
+                current = state
+            self._user_states[user_id] = current
+            self._user_states.move_to_end(user_id)
+            self._last_access[user_id] = now
+
+            # The previous request may have grown this session (e.g. a PDF upload)
+            self._refresh_size(user_id)
+            self._evict_over_limit(keep=user_id)
+            return current
+
+    def session_lock(self, user_id: str) -> threading.RLock:
+        """Per-session lock, shared by every thread working on user_id."""
+        with self._lock:
+            lock = self._session_locks.get(user_id)
+            if lock is None:
+                lock = threading.RLock()
+                self._session_locks[user_id] = lock
+            return lock
+
+    @contextmanager
+    def session(self, user_id: str, durable: bool = False) -> Iterator[ChatbotState]:
+        """
+        Exclusive access to one session for a whole turn.
+        Concurrent turns from the same user run one after another, while different
+        users never wait on each other. The session is touched on successful exit;
+        durable changes (uploads, workspace edits) are written to the backend at once.
+        """
+        lock = self.session_lock(user_id)
+        with lock:
+            state = self.get_state(user_id)
+            yield state
+            self.touch(user_id, durable=durable, state=state)
+
+    def touch(self, user_id: str, durable: bool = False, state: Optional[ChatbotState] = None) -> None:
+        """
+        Call after mutating a session: re-measures it so limits apply immediately
+        and queues it for the backend (or writes it now when durable).
+        state is the object the caller mutated; it is put back if the session was
+        evicted or expired meanwhile, so a long turn's changes are not dropped.
+        """
+        with self._lock:
+            current = self._user_states.get(user_id)
+            if current is None and state is not None:
+                self._user_states[user_id] = state
+                self._last_access[user_id] = time.monotonic()
+                current = state
+            state = current
+            if state is not None:
+                self._refresh_size(user_id)
+                self._evict_over_limit(keep=user_id)
+        if state is not None:
+            # Keeps this session's stored PDFs from being evicted by any worker
+            for ref in list(state.documents.values()):
+                if ref.document.pages is not None:
+                    pdf_store.touch(ref.document.doc_id)
+            self.backend.save(user_id, state, immediate=durable)
+
+    def remove(self, user_id: str) -> None:
+        with self._lock:
+            self._drop(user_id)
+        self.backend.delete(user_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'sessions': len(self._user_states),
+                'bytes': self._total_bytes,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def _refresh_size(self, user_id: str) -> None:
+        size = self._user_states[user_id].estimated_size()
+        self._total_bytes += size - self._sizes.get(user_id, 0)
+        self._sizes[user_id] = size
+
+    def _drop(self, user_id: str) -> None:
+        if self._user_states.pop(user_id, None) is not None:
+            self._last_access.pop(user_id, None)
+            self._total_bytes -= self._sizes.pop(user_id, 0)
+
+    def _expire_idle(self, now: float) -> None:
+        # Iteration order is access order, so idle sessions are always at the front
+        while self._user_states:
+            oldest_id = next(iter(self._user_states))
+            if now - self._last_access[oldest_id] <= self.idle_ttl:
+                break
+            self._drop(oldest_id)
+            self.expirations += 1
+
+    def _evict_over_limit(self, keep: str) -> None:
+        while (len(self._user_states) > self.max_entries or self._total_bytes > self.max_bytes) \
+                and len(self._user_states) > 1:
+            candidates = iter(self._user_states)
+            oldest_id = next(candidates)
+            if oldest_id == keep:
+                # The session in use is never evicted; the next oldest goes instead
+                oldest_id = next(candidates)
+            self._drop(oldest_id)
+            self.evictions += 1
 
 # Global instance
-chat_manager = ChatManager()
+chat_manager = ChatManager(
+    max_entries=Config.SESSION_MAX_ENTRIES,
+    max_bytes=Config.SESSION_MAX_BYTES,
+    idle_ttl=Config.SESSION_IDLE_TTL,
+    backend=create_session_backend(),
+)
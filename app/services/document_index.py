@@ -0,0 +1,190 @@
+import heapq
+import math
+import re
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from config import Config
+from app.services.metrics import metrics
+
+if TYPE_CHECKING:
+    from app.services.paged_pdf import PagedPDF
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+_STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it me my of on or
+please the this that to was what when where which who why will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords and single characters removed."""
+    return [tok for tok in _TOKEN_RE.findall(text.lower()) if len(tok) > 1 and tok not in _STOPWORDS]
+
+
+class _PagedChunks(Sequence):
+    """Chunk texts of a paged document, re-split from cached pages on access."""
+
+    def __init__(self, pages: "PagedPDF", spans: List[Tuple[int, int]], chunk_chars: int):
+        self._pages = pages
+        self._spans = spans
+        self._chunk_chars = chunk_chars
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def __getitem__(self, chunk_id: int) -> str:
+        page_no, ordinal = self._spans[chunk_id]
+        chunks = DocumentIndex.split_chunks(self._pages.page(page_no), self._chunk_chars)
+        return chunks[ordinal] if ordinal < len(chunks) else ""
+
+
+class DocumentIndex:
+    """
+    BM25 index over fixed-size chunks of an uploaded document.
+    Built once at upload time; used to pick the chunks most relevant to a
+    question instead of always sending the opening characters of the file.
+    """
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self, chunks: Sequence[str], chunk_texts: Optional[Iterable[str]] = None):
+        """
+        chunks gives chunk text by id. chunk_texts, if given, is iterated instead to
+        build the postings, so a lazy chunk store is not read back while indexing.
+        """
+        self.chunks = chunks
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._chunk_lengths: List[int] = []
+        # Characters per chunk, so context selection never has to read unselected chunks
+        self.chunk_sizes: List[int] = []
+        resident_chars = 0
+
+        for chunk_id, chunk in enumerate(chunks if chunk_texts is None else chunk_texts):
+            terms = tokenize(chunk)
+            self._chunk_lengths.append(len(terms))
+            self.chunk_sizes.append(len(chunk))
+            resident_chars += len(chunk)
+            for term, tf in Counter(terms).items():
+                self._postings.setdefault(term, []).append((chunk_id, tf))
+
+        self.total_chars = resident_chars
+        # Chunk text only counts towards memory when the index holds it
+        self._resident_chars = resident_chars if chunk_texts is None else 0
+        n = len(self._chunk_lengths)
+        total = sum(self._chunk_lengths)
+        self._avg_length = (total / n) if n else 0.0
+        self._idf = {
+            term: math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    @classmethod
+    def build(cls, text: str, chunk_chars: Optional[int] = None) -> "DocumentIndex":
+        """Splits text into ~chunk_chars pieces on line boundaries and indexes them."""
+        return cls(cls.split_chunks(text, chunk_chars or Config.RETRIEVAL_CHUNK_CHARS))
+
+    @classmethod
+    def build_paged(cls, pages: "PagedPDF", chunk_chars: Optional[int] = None) -> "DocumentIndex":
+        """
+        Indexes a PDF page by page without keeping its text. Chunks never span pages,
+        and a chunk's text is re-read from the page cache when it is selected.
+        The pages read are handed to the PDF's text cache entry on the way, so the
+        same PDF uploaded again later is not parsed again.
+        """
+        chunk_chars = chunk_chars or Config.RETRIEVAL_CHUNK_CHARS
+        spans: List[Tuple[int, int]] = []  # chunk id -> (page number, chunk number within the page)
+        page_texts: List[str] = []
+
+        def chunk_texts() -> Iterator[str]:
+            for page_no, page_text in enumerate(pages.iter_pages()):
+                if page_text:
+                    page_texts.append(page_text)
+                for ordinal, chunk in enumerate(cls.split_chunks(page_text, chunk_chars)):
+                    spans.append((page_no, ordinal))
+                    yield chunk
+
+        with metrics.span("index_build_paged"):
+            index = cls(_PagedChunks(pages, spans, chunk_chars), chunk_texts=chunk_texts())
+        pages.cache_text("\n".join(page_texts).strip())
+        return index
+
+    @property
+    def is_paged(self) -> bool:
+        """Whether chunk text is read from the PDF's pages rather than held by the index."""
+        return isinstance(self.chunks, _PagedChunks)
+
+    @staticmethod
+    def split_chunks(text: str, chunk_chars: int) -> List[str]:
+        chunks: List[str] = []
+        current: List[str] = []
+        current_len = 0
+
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            # Hard-wrap pathological lines (PDFs without line breaks)
+            while len(line) > chunk_chars:
+                if current:
+                    chunks.append("\n".join(current))
+                    current, current_len = [], 0
+                chunks.append(line[:chunk_chars])
+                line = line[chunk_chars:]
+            if current_len + len(line) > chunk_chars and current:
+                chunks.append("\n".join(current))
+                current, current_len = [], 0
+            current.append(line)
+            current_len += len(line) + 1
+
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        """Returns (chunk_id, score) pairs for the best matching chunks, best first."""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf[term]
+            for chunk_id, tf in postings:
+                norm = self.K1 * (1 - self.B + self.B * self._chunk_lengths[chunk_id] / self._avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.K1 + 1) / (tf + norm)
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def select_context(self, query: str, char_budget: Optional[int] = None) -> str:
+        """
+        Returns the most relevant chunks that fit in char_budget, in document order.
+        Falls back to the opening chunks when nothing in the query matches.
+        """
+        char_budget = char_budget or Config.RETRIEVAL_CONTEXT_CHARS
+        ranked = [chunk_id for chunk_id, _ in self.search(query, top_k=len(self.chunk_sizes))]
+        if not ranked:
+            ranked = range(len(self.chunk_sizes))
+
+        selected: List[int] = []
+        used = 0
+        for chunk_id in ranked:
+            if used >= char_budget:
+                break
+            size = self.chunk_sizes[chunk_id]
+            if used + size > char_budget:
+                if not selected:
+                    # Always return something, even if the best chunk alone is too big
+                    selected.append(chunk_id)
+                    break
+                continue
+            selected.append(chunk_id)
+            used += size
+
+        # Only the selected chunks are read (paged documents re-read them from their pages)
+        return "\n...\n".join(self.chunks[chunk_id][:char_budget] for chunk_id in sorted(selected))
+
+    def estimated_size(self) -> int:
+        """Rough memory footprint in bytes (chunk text + postings)."""
+        return self._resident_chars + 8 * len(self.chunk_sizes) + 16 * sum(len(p) for p in self._postings.values())
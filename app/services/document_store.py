@@ -0,0 +1,338 @@
+import logging
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import Config
+from app.services.document_index import DocumentIndex
+
+if TYPE_CHECKING:
+    from app.services.paged_pdf import PagedPDF
+
+logger = logging.getLogger(__name__)
+
+TextLoader = Callable[[], Optional[str]]
+
+
+class Document:
+    """
+    One unique document, shared by every session that uploaded the same PDF.
+    The text is loaded on first use and its retrieval index is built once, on
+    first use too. Both can be dropped under memory pressure when the text can be
+    reloaded (from the text cache's disk layer or the session database).
+
+    Documents backed by a stored PDF (`pages`) are read page by page instead:
+    page access, the index and summaries never need the whole text in memory.
+    """
+
+    __slots__ = (
+        'doc_id', '_text', '_index', '_loader', '_lock', '_index_lock', '_corpus', 'pages',
+        'char_count', 'persisted', '__weakref__',
+    )
+
+    # Page size used to stream documents that only exist as text
+    TEXT_PAGE_CHARS = 3000
+
+    def __init__(self, doc_id: str, text: Optional[str] = None, loader: Optional[TextLoader] = None,
+                 corpus: Optional["DocumentCorpus"] = None, pages: Optional["PagedPDF"] = None):
+        self.doc_id = doc_id
+        self._text = text
+        self._index: Optional[DocumentIndex] = None
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()  # Held while building, which can take a while for big PDFs
+        self._corpus = corpus
+        self.pages = pages
+        self.char_count = len(text) if text is not None else None
+        self.persisted = False  # Set once a session backend has stored the text
+
+    def _paged(self) -> Optional["PagedPDF"]:
+        """The stored PDF, unless its file is gone (then the loader, e.g. the session database, is used)."""
+        pages = self.pages
+        return pages if pages is not None and pages.available() else None
+
+    @property
+    def page_count(self) -> int:
+        pages = self._paged()
+        if pages is not None:
+            return pages.page_count
+        text = self.text or ""
+        return max(1, -(-len(text) // self.TEXT_PAGE_CHARS)) if text else 0
+
+    def iter_pages(self) -> Iterator[str]:
+        """Page texts in order; a stored PDF is read lazily, plain text is sliced."""
+        pages = self._paged()
+        if pages is not None and self._text is None:
+            yield from pages.iter_pages()
+            return
+        text = self.text or ""
+        for start in range(0, len(text), self.TEXT_PAGE_CHARS):
+            yield text[start:start + self.TEXT_PAGE_CHARS]
+
+    def head(self, max_chars: int) -> str:
+        """Opening text, without loading the rest of a paged document."""
+        pages = self._paged()
+        if pages is not None and self._text is None:
+            return pages.head(max_chars)
+        return (self.text or "")[:max_chars]
+
+    def read_text(self) -> Optional[str]:
+        """
+        Text for persistence. None for a paged document whose text was never extracted:
+        its stored PDF is the durable copy, and extracting it just to save it would undo the laziness.
+        """
+        if self._paged() is not None:
+            return self._text
+        return self.text
+
+    @property
+    def text(self) -> Optional[str]:
+        loaded = False
+        with self._lock:
+            text = self._text
+            if text is None and self._loader is not None:
+                text = self._loader()
+                if text is None:
+                    logger.warning(f"Document {self.doc_id[:12]} could not be reloaded")
+                self._text = text
+                self.char_count = len(text) if text is not None else None
+                loaded = text is not None
+        if self._corpus is not None and text is not None:
+            self._corpus._touch(self, loaded)
+        return text
+
+    @property
+    def index(self) -> Optional[DocumentIndex]:
+        """BM25 index over the text, built on first use and shared by all sessions."""
+        index = self._index
+        if index is not None:
+            if self._corpus is not None:
+                self._corpus._touch(self, False)
+            return index
+
+        with self._index_lock:
+            if self._index is None:
+                pages = self._paged()
+                if pages is not None and self._text is None:
+                    index = DocumentIndex.build_paged(pages)
+                    self.char_count = index.total_chars
+                else:
+                    text = self.text
+                    if not text:
+                        return None
+                    index = DocumentIndex.build(text)
+                with self._lock:
+                    self._index = index
+            index = self._index
+        if self._corpus is not None:
+            self._corpus._touch(self, True)
+        return index
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._text is not None
+
+    def can_unload(self) -> bool:
+        return self._loader is not None
+
+    def set_loader(self, loader: TextLoader) -> None:
+        with self._lock:
+            if self._loader is None:
+                self._loader = loader
+
+    def unload(self) -> None:
+        """Drops the text and index; the next access reloads them."""
+        with self._lock:
+            if self._loader is not None:
+                self._text = None
+                if self._index is not None and not self._index.is_paged:
+                    # A paged index holds no text, so it is cheap to keep
+                    self._index = None
+
+    def estimated_size(self) -> int:
+        """Resident bytes (text + index); 0 while unloaded."""
+        size = sys.getsizeof(self._text) if self._text is not None else 0
+        index = self._index
+        if index is not None:
+            size += index.estimated_size()
+        return size
+
+
+class DocumentRef:
+    """A session's handle on a shared Document, with the name it was uploaded under."""
+
+    __slots__ = ('name', 'file_type', 'document', 'added_at')
+
+    def __init__(self, name: str, file_type: str, document: Document, added_at: Optional[float] = None):
+        self.name = name
+        self.file_type = file_type
+        self.document = document
+        self.added_at = time.time() if added_at is None else added_at
+
+
+class DocumentCorpus:
+    """
+    Process-wide, deduplicated set of documents, keyed by the SHA-256 of the PDF.
+    Sessions reference Documents instead of holding their own copies, so memory
+    grows with unique documents rather than with uploads. A document disappears
+    once no session references it; while referenced, the least recently used
+    reloadable documents are unloaded when resident text exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._documents: "weakref.WeakValueDictionary[str, Document]" = weakref.WeakValueDictionary()
+        self._resident: "OrderedDict[str, int]" = OrderedDict()  # doc_id -> size, least recently used first
+        self._resident_bytes = 0
+        # Reentrant: a document's finalizer (_forget) can run while this thread holds the lock
+        self._lock = threading.RLock()
+        self.dedup_hits = 0
+        self.unloads = 0
+
+    def get(self, doc_id: str) -> Optional[Document]:
+        """The live document with this id, if any session still references it."""
+        with self._lock:
+            document = self._documents.get(doc_id)
+            if document is not None:
+                self.dedup_hits += 1
+            return document
+
+    def add(self, doc_id: str, text: str, loader: Optional[TextLoader] = None) -> Document:
+        """Registers extracted text, or returns the existing document with the same id."""
+        with self._lock:
+            document = self._documents.get(doc_id)
+            if document is not None:
+                self.dedup_hits += 1
+                return document
+            document = self._register(doc_id, text, loader)
+        self._touch(document, True)
+        return document
+
+    def add_paged(self, doc_id: str, pages: "PagedPDF", text: Optional[str] = None) -> Document:
+        """
+        Registers a stored PDF that is read page by page, or returns the existing document.
+        text, if already known (e.g. from the text cache), is used instead of the pages.
+        """
+        with self._lock:
+            document = self._documents.get(doc_id)
+            if document is not None:
+                self.dedup_hits += 1
+                return document
+            document = self._register(doc_id, text, pages.full_text, pages=pages)
+        if text is not None:
+            self._touch(document, True)
+        return document
+
+    def reference(self, doc_id: str, loader: TextLoader, pages: Optional["PagedPDF"] = None) -> Document:
+        """The live document with this id, or a lazy one whose text comes from loader."""
+        with self._lock:
+            document = self._documents.get(doc_id)
+            if document is None:
+                document = self._register(doc_id, None, loader, pages=pages)
+                document.persisted = True
+            return document
+
+    def is_live(self, doc_id: str) -> bool:
+        """Whether any session still references doc_id (does not count as a dedup hit)."""
+        with self._lock:
+            return doc_id in self._documents
+
+    def _register(self, doc_id: str, text: Optional[str], loader: Optional[TextLoader],
+                  pages: Optional["PagedPDF"] = None) -> Document:
+        document = Document(doc_id, text, loader, corpus=self, pages=pages)
+        self._documents[doc_id] = document
+        weakref.finalize(document, self._forget, doc_id)
+        return document
+
+    def _forget(self, doc_id: str) -> None:
+        with self._lock:
+            size = self._resident.pop(doc_id, None)
+            if size is not None:
+                self._resident_bytes -= size
+
+    def _touch(self, document: Document, resized: bool) -> None:
+        """Marks a document recently used; re-measures it and enforces the budget if it grew."""
+        with self._lock:
+            doc_id = document.doc_id
+            if self._documents.get(doc_id) is not document:
+                return
+            if doc_id in self._resident and not resized:
+                self._resident.move_to_end(doc_id)
+                return
+
+            size = document.estimated_size()
+            self._resident_bytes += size - self._resident.pop(doc_id, 0)
+            self._resident[doc_id] = size
+            self._unload_over_budget(keep=doc_id)
+
+    def _unload_over_budget(self, keep: str) -> None:
+        for doc_id in list(self._resident):
+            if self._resident_bytes <= self.max_bytes:
+                break
+            if doc_id == keep:
+                continue
+            document = self._documents.get(doc_id)
+            if document is not None and not document.can_unload():
+                continue
+            if document is not None:
+                document.unload()
+                self.unloads += 1
+            self._resident_bytes -= self._resident.pop(doc_id, 0)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'documents': len(self._documents),
+                'resident': len(self._resident),
+                'bytes': self._resident_bytes,
+                'dedup_hits': self.dedup_hits,
+                'unloads': self.unloads,
+            }
+
+
+def select_workspace_context(refs: List[DocumentRef], query: str, char_budget: Optional[int] = None) -> str:
+    """
+    Best matching chunks across several documents, labelled with their file names.
+    Each document is searched with its own index and the hits are merged by score.
+    """
+    char_budget = char_budget or Config.RETRIEVAL_CONTEXT_CHARS
+    hits: List[Tuple[float, int, int]] = []  # (score, ref position, chunk_id)
+    indexes = []
+    for position, ref in enumerate(refs):
+        index = ref.document.index
+        indexes.append(index)
+        if index is not None:
+            hits.extend((score, position, chunk_id) for chunk_id, score in index.search(query, top_k=8))
+
+    if not hits:
+        # Nothing matched; fall back to the most recent document's opening
+        latest = indexes[-1] if indexes else None
+        return latest.select_context(query, char_budget) if latest is not None else ""
+
+    hits.sort(reverse=True)
+    selected: Dict[int, List[int]] = {}
+    used = 0
+    for _, position, chunk_id in hits:
+        if used >= char_budget:
+            break
+        size = indexes[position].chunk_sizes[chunk_id]
+        if used + size > char_budget:
+            if used:
+                continue
+            size = char_budget
+        selected.setdefault(position, []).append(chunk_id)
+        used += size
+
+    sections = []
+    for position in sorted(selected):
+        chunks = indexes[position].chunks
+        body = "\n...\n".join(chunks[chunk_id][:char_budget] for chunk_id in sorted(selected[position]))
+        sections.append(f"[{refs[position].name}]\n{body}")
+    return "\n\n".join(sections)
+
+
+# Global instance
+document_corpus = DocumentCorpus(max_bytes=Config.DOCUMENT_CORPUS_MAX_BYTES)
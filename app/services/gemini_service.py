@@ -1,12 +1,31 @@
 
 import google.generativeai as genai
-import os
+import asyncio
+import json
 import logging
-from flask import current_app
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Deque, Iterable, Iterator, Optional, Tuple, Union
+from config import Config
+from app.services.response_cache import CacheKey, response_cache
+from app.services.rate_limiter import gemini_guard
+from app.services.model_registry import model_registry
+from app.services.metrics import metrics
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Marks the end of a stream handed from the loop to the request thread
+_STREAM_END = object()
+
+
+class StreamInterrupted(Exception):
+    """A stream failed after output was sent; it is not retried, so nothing is repeated."""
+
 class GeminiService:
     """
     Service to handle interactions with Google's Gemini API.
@@ -14,94 +33,329 @@ class GeminiService:
     """
     
     _model = None
+    _model_lock = threading.Lock()
+
+    PREFERRED_MODELS = [
+        'gemini-1.5-flash',
+        'gemini-1.5-pro',
+        'gemini-1.0-pro',
+        'gemini-pro'
+    ]
+
+    # Background event loop that owns all Gemini traffic (blocking calls from request
+    # threads included), so GEMINI_MAX_CONCURRENCY is one limit for the whole process.
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _loop_lock = threading.Lock()
+    _semaphore: Optional[asyncio.Semaphore] = None
 
     @classmethod
     def configure(cls):
-        """Initializes the Gemini API with the API key."""
-        api_key = os.environ.get('GEMINI_API_KEY') or current_app.config.get('GEMINI_API_KEY')
-        
-        if not api_key:
+        """Initializes the Gemini API with the API key (once per process, via the model registry)."""
+        if not model_registry.ensure_configured():
             logger.error("GEMINI_API_KEY not found in environment variables.")
             return False
-            
-        genai.configure(api_key=api_key)
         return True
 
     @classmethod
     def get_model(cls):
         """
         Dynamically finds and returns a verified GenerativeModel.
-        Tries preferred models first, then falls back to any available model.
+        Uses the on-disk model selection if it is still fresh; otherwise lists the
+        available models, prefers known-good ones, then falls back to any available model.
         """
         if cls._model:
             return cls._model
 
-        # Ensure we are configured
-        if not cls.configure():
-            return None
+        with cls._model_lock:
+            if cls._model:
+                return cls._model
 
-        preferred_models = [
-            'gemini-1.5-flash',
-            'gemini-1.5-pro',
-            'gemini-1.0-pro',
-            'gemini-pro'
-        ]
+            # Ensure we are configured
+            if not cls.configure():
+                return None
 
+            model_name = cls._read_cached_model_name()
+            if model_name:
+                logger.info(f"Using cached model selection: {model_name}")
+            else:
+                model_name = cls._discover_model_name()
+                if not model_name:
+                    return None
+
+            cls._model = model_registry.get(model_name)
+            return cls._model
+
+    @classmethod
+    def _discover_model_name(cls) -> Optional[str]:
+        """Asks the API which models are available and picks one (network round trip)."""
         try:
-            # 1. Try preferred models directly first (fastest path)
-            for model_name in preferred_models:
-                try:
-                    # Test instantiation
-                    model = genai.GenerativeModel(model_name)
-                    # Test a dummy generation to ensure access? 
-                    # Actually, instantiation doesn't hit API. 
-                    # We might just try to generate 'Hello' to verify.
-                    # But that consumes quota. Let's list models instead.
-                    pass 
-                except Exception:
-                    continue
-
-            # 2. List available models to find one that works
+            # List available models to find one that works
             available_models = [m for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
             logger.info(f"Available Gemini Models: {[m.name for m in available_models]}")
             
             # Check if any preferred model is in the available list
-            for pref in preferred_models:
+            for pref in cls.PREFERRED_MODELS:
                 # API returns names like 'models/gemini-pro'
                 match = next((m for m in available_models if m.name.endswith(pref)), None)
                 if match:
                     logger.info(f"Selected Model: {match.name}")
-                    cls._model = genai.GenerativeModel(match.name)
-                    return cls._model
+                    cls._write_cached_model_name(match.name)
+                    return match.name
 
             # Fallback: pick the first available one
             if available_models:
                 first_model = available_models[0]
                 logger.info(f"Fallback to available model: {first_model.name}")
-                cls._model = genai.GenerativeModel(first_model.name)
-                return cls._model
+                cls._write_cached_model_name(first_model.name)
+                return first_model.name
 
         except Exception as e:
             logger.error(f"Error listing methods: {e}")
-            # Desperate fallback
+            # Desperate fallback (not cached, so the next worker tries discovery again)
             logger.warning("Could not list models. Forcing 'gemini-1.5-flash'.")
-            cls._model = genai.GenerativeModel('gemini-1.5-flash')
-            return cls._model
+            return 'gemini-1.5-flash'
 
         return None
 
+    @staticmethod
+    def _read_cached_model_name() -> Optional[str]:
+        path = Config.MODEL_CACHE_PATH
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - data.get('resolved_at', 0) > Config.MODEL_CACHE_TTL:
+            return None
+        return data.get('model_name')
+
+    @staticmethod
+    def _write_cached_model_name(model_name: str) -> None:
+        path = Config.MODEL_CACHE_PATH
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'model_name': model_name, 'resolved_at': time.time()}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not cache model selection: {e}")
+
+    @classmethod
+    def warm_up(cls, app) -> None:
+        """
+        Resolves the model in a background thread at startup so the first request
+        does not pay for discovery. Safe to call when no API key is configured.
+        """
+        def _resolve():
+            with app.app_context():
+                try:
+                    cls.get_model()
+                except Exception as e:
+                    logger.warning(f"Gemini warm-up failed: {e}")
+
+        threading.Thread(target=_resolve, name="gemini-warmup", daemon=True).start()
+
     @classmethod
     def generate_response(cls, prompt: str) -> str:
         """
         Generates a response from the Gemini API.
+        Runs on the shared loop under GEMINI_MAX_CONCURRENCY; the calling thread waits.
         """
         model = cls.get_model()
         if not model:
             return "⚠️ System Error: Unable to initialize AI Brain. Please check API Key configuration."
 
+        return cls._run(cls.generate_content_async(model, prompt))
+
+    @classmethod
+    def get_model_name(cls) -> str:
+        """Name of the resolved model, used to scope cached responses."""
+        model = cls.get_model()
+        return getattr(model, 'model_name', '') if model else ''
+
+    @staticmethod
+    def is_error_response(text: str) -> bool:
+        """generate_response reports failures as '⚠️' messages instead of raising."""
+        return text.startswith("⚠️")
+
+    @classmethod
+    def generate_cached_response(cls, prompt: str, task: str, document: str, focus: Optional[str] = None) -> str:
+        """
+        generate_response for deterministic document tasks.
+        Repeat requests for the same (task, document, focus, model) skip the API call.
+        """
+        key = response_cache.make_key(task, document, focus, cls.get_model_name())
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
+        response = cls.generate_response(prompt)
+        if not cls.is_error_response(response):
+            response_cache.put(key, response)
+        return response
+
+    @classmethod
+    def stream_response(cls, prompt: str) -> Iterator[str]:
+        """
+        Streams a response from the Gemini API chunk by chunk.
+        Yields text fragments as soon as the model produces them. The stream is read
+        on the shared loop, holding a GEMINI_MAX_CONCURRENCY slot until it ends.
+        """
+        model = cls.get_model()
+        if not model:
+            yield "⚠️ System Error: Unable to initialize AI Brain. Please check API Key configuration."
+            return
+
+        metrics.prompt_chars.observe(len(prompt), mode="stream")
+        streamed = 0
+        chunks: "queue.Queue" = queue.Queue()
+        with metrics.span("gemini_stream") as span:
+            producer = asyncio.run_coroutine_threadsafe(cls._stream_into(model, prompt, chunks), cls._get_loop())
+            try:
+                while True:
+                    text = chunks.get()
+                    if text is _STREAM_END:
+                        break
+                    streamed += len(text)
+                    yield text
+                producer.result()
+            except Exception as e:
+                logger.error(f"Gemini Streaming Error: {e}")
+                span.outcome = "error"
+                yield f"⚠️ I'm having trouble thinking right now. (Error: {str(e)})"
+                return
+            finally:
+                # Stops reading upstream if the client went away mid-stream
+                producer.cancel()
+        metrics.response_chars.observe(streamed, mode="stream")
+
+    @classmethod
+    async def _stream_into(cls, model, prompt: str, chunks: "queue.Queue") -> None:
+        """Reads a streamed generation into chunks, then puts _STREAM_END (also on failure)."""
+        started = False
+
+        async def read_stream():
+            nonlocal started
+            try:
+                response = await model.generate_content_async(prompt, stream=True)
+                async for chunk in response:
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks without text parts (e.g. safety metadata) are skipped
+                        continue
+                    if text:
+                        started = True
+                        chunks.put(text)
+            except Exception as e:
+                if started:
+                    raise StreamInterrupted(str(e)) from e
+                raise
+
         try:
-            response = model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            logger.error(f"Gemini Generation Error: {e}")
-            return f"⚠️ I'm having trouble thinking right now. (Error: {str(e)})"
+            await gemini_guard.call_async(read_stream, prompt, limit=cls._semaphore)
+        finally:
+            chunks.put(_STREAM_END)
+
+    @classmethod
+    def _get_loop(cls) -> asyncio.AbstractEventLoop:
+        """Starts the shared event loop thread on first use."""
+        with cls._loop_lock:
+            if cls._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="gemini-async", daemon=True).start()
+                cls._semaphore = asyncio.run_coroutine_threadsafe(
+                    cls._make_semaphore(Config.GEMINI_MAX_CONCURRENCY), loop
+                ).result()
+                cls._loop = loop
+            return cls._loop
+
+    @staticmethod
+    async def _make_semaphore(limit: int) -> asyncio.Semaphore:
+        return asyncio.Semaphore(limit)
+
+    @classmethod
+    def _run(cls, coro):
+        """Runs coro on the shared loop and waits for its result in the calling thread."""
+        return asyncio.run_coroutine_threadsafe(coro, cls._get_loop()).result()
+
+    @classmethod
+    async def _generate_text(cls, model, prompt: str, bulk: bool = False) -> str:
+        """One guarded generation; the semaphore is only held while upstream is called."""
+        response = await gemini_guard.call_async(
+            lambda: model.generate_content_async(prompt), prompt, bulk=bulk, limit=cls._semaphore
+        )
+        return response.text
+
+    @classmethod
+    def generate_text(cls, model, prompt: str) -> str:
+        """
+        Blocking generation with any model under the shared limits. Raises on
+        failure, for callers with their own error handling (LLMService).
+        """
+        return cls._run(cls._generate_text(model, prompt))
+
+    @classmethod
+    async def generate_content_async(cls, model, prompt: str, bulk: bool = False) -> str:
+        """
+        Runs one generation on the shared loop, bounded by GEMINI_MAX_CONCURRENCY.
+        Must be scheduled on the loop returned by _get_loop(). bulk selects the
+        rate limiter's bulk lane.
+        """
+        metrics.prompt_chars.observe(len(prompt), mode="async")
+        # The span includes time queued for rate limits and the semaphore, which is part of what callers wait for
+        with metrics.span("gemini_generate_async") as span:
+            try:
+                text = await cls._generate_text(model, prompt, bulk=bulk)
+            except Exception as e:
+                logger.error(f"Gemini Async Generation Error: {e}")
+                span.outcome = "error"
+                return f"⚠️ I'm having trouble thinking right now. (Error: {str(e)})"
+        metrics.response_chars.observe(len(text), mode="async")
+        return text
+
+    @classmethod
+    def map_cached_responses(cls, jobs: Iterable[Tuple[str, str]], task: str, focus: Optional[str] = None,
+                             concurrency: Optional[int] = None) -> Iterator[str]:
+        """
+        generate_cached_response over many (prompt, document) pairs, yielded in order.
+        Cached documents skip the API; the rest run on the shared loop with at most
+        `concurrency` in flight, in the rate limiter's bulk lane so they cannot starve
+        chat. Jobs are pulled lazily, so only that window is held.
+        """
+        model = cls.get_model()
+        if not model:
+            yield "⚠️ System Error: Unable to initialize AI Brain. Please check API Key configuration."
+            return
+
+        model_name = getattr(model, 'model_name', '')
+        concurrency = max(1, concurrency or Config.SUMMARY_CONCURRENCY)
+        loop = cls._get_loop()
+        jobs = iter(jobs)
+        # (cache key, in-flight future) or (None, cached response), in job order
+        window: Deque[Tuple[Optional[CacheKey], Union[str, Future]]] = deque()
+        exhausted = False
+
+        while True:
+            while not exhausted and len(window) < concurrency:
+                job = next(jobs, None)
+                if job is None:
+                    exhausted = True
+                    break
+                prompt, document = job
+                key = response_cache.make_key(task, document, focus, model_name)
+                cached = response_cache.get(key)
+                if cached is not None:
+                    window.append((None, cached))
+                else:
+                    window.append((key, asyncio.run_coroutine_threadsafe(cls.generate_content_async(model, prompt, bulk=True), loop)))
+            if not window:
+                return
+
+            key, result = window.popleft()
+            if key is not None:
+                result = result.result()
+                if not cls.is_error_response(result):
+                    response_cache.put(key, result)
+            yield result
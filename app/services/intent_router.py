@@ -0,0 +1,87 @@
+import re
+from typing import Dict, FrozenSet, Iterable, Set
+
+# Intent -> trigger keywords (matched as case-insensitive substrings, like the
+# original `"kw" in message_lower` checks). Add new intents here.
+INTENT_KEYWORDS: Dict[str, Iterable[str]] = {
+    # Document actions (MentorService)
+    'analyze': ["analyze", "review", "critique", "evaluate"],
+    'summary': ["summarize", "summary", "overview"],
+    'notes': ["notes", "study material"],
+
+    # Topic routing (LLMService.handle_llm_query, AdvisoryService)
+    'career': ["career"],
+    'resume': ["resume"],
+    'interview': ["interview"],
+    'project': ["project"],
+    'schedule': ["timetable", "schedule"],
+    'backlog': ["backlog"],
+    'subject': ["subject"],
+
+    # Career details (enhanced_career_query)
+    'roadmap': ["roadmap", "path"],
+    'software': ["software", "programming"],
+    'data': ["data", "analytics"],
+    'job': ["job"],
+    'search': ["search", "find"],
+    'salary': ["salary", "compensation"],
+
+    # Resume details (enhanced_resume_query)
+    'format': ["format", "template"],
+    'skills': ["skills"],
+    'experience': ["experience", "work"],
+    'ats': ["ats", "applicant tracking"],
+
+    # Interview details (enhanced_interview_query)
+    'technical': ["technical"],
+    'behavioral': ["behavioral"],
+    'questions': ["questions"],
+    'ask': ["ask"],
+
+    # General topics (handle_general_query)
+    'study': ["study", "learn", "education", "academic"],
+    'motivation': ["motivation", "productivity", "focus", "procrastination"],
+}
+
+
+class IntentRouter:
+    """
+    Matches every intent in a message with one pass of a single compiled regex.
+
+    Each keyword is a named group inside a zero-width lookahead, so the scan
+    tries all keywords at every position in C. Keywords are ordered longest
+    first; any shorter keyword that matches at the same position is a prefix of
+    the longer one, so each group also carries the intents of its prefixes and
+    the result is identical to testing every keyword with `in`.
+    """
+
+    def __init__(self, intents: Dict[str, Iterable[str]]):
+        keyword_intents: Dict[str, Set[str]] = {}
+        for intent, keywords in intents.items():
+            for keyword in keywords:
+                keyword_intents.setdefault(keyword.lower(), set()).add(intent)
+
+        keywords = sorted(keyword_intents, key=len, reverse=True)
+        self._group_intents: Dict[str, FrozenSet[str]] = {}
+        alternatives = []
+        for i, keyword in enumerate(keywords):
+            group = f"k{i}"
+            matched: Set[str] = set()
+            for other in keywords:
+                if keyword.startswith(other):
+                    matched |= keyword_intents[other]
+            self._group_intents[group] = frozenset(matched)
+            alternatives.append(f"(?P<{group}>{re.escape(keyword)})")
+
+        self._pattern = re.compile("(?=(?:" + "|".join(alternatives) + "))")
+
+    def match(self, text: str) -> FrozenSet[str]:
+        """Returns every intent whose keywords occur in text."""
+        found: Set[str] = set()
+        for m in self._pattern.finditer(text.lower()):
+            found |= self._group_intents[m.lastgroup]
+        return frozenset(found)
+
+
+# Global instance
+intent_router = IntentRouter(INTENT_KEYWORDS)
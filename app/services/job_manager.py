@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class Job:
+    """A unit of background work and its progress/result."""
+
+    def __init__(self, task: str, owner: str):
+        self.id = uuid.uuid4().hex
+        self.task = task
+        self.owner = owner
+        self.status = "queued"  # queued -> running -> done | failed
+        self.progress = 0.0
+        self.result: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def set_progress(self, progress: float) -> None:
+        self.progress = max(0.0, min(1.0, progress))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'task': self.task,
+            'status': self.status,
+            'progress': round(self.progress, 2),
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    In-process job queue for slow document work (analysis, summaries, notes, PDF export).
+    Jobs run on a thread pool; finished jobs are retained for `result_ttl` seconds
+    (and at most `max_retained` jobs) so clients can poll for the result.
+    """
+
+    def __init__(self, workers: int, result_ttl: float, max_retained: int):
+        self.result_ttl = result_ttl
+        self.max_retained = max_retained
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, task: str, owner: str, fn: Callable[[Job], str], app=None) -> Job:
+        """
+        Queues fn(job) and returns the job immediately.
+        fn may call job.set_progress(); its return value becomes job.result.
+        """
+        job = Job(task, owner)
+        with self._lock:
+            self._prune(time.time())
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, app)
+        return job
+
+    def get(self, job_id: str, owner: Optional[str] = None) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+    def _run(self, job: Job, fn: Callable[[Job], str], app) -> None:
+        job.status = "running"
+        try:
+            if app is not None:
+                with app.app_context():
+                    job.result = fn(job)
+            else:
+                job.result = fn(job)
+            job.status = "done"
+            job.set_progress(1.0)
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.task}) failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self, now: float) -> None:
+        # Drop expired finished jobs, then the oldest finished ones beyond the retention cap
+        for job_id in [jid for jid, j in self._jobs.items() if j.finished_at and now - j.finished_at > self.result_ttl]:
+            del self._jobs[job_id]
+
+        if len(self._jobs) >= self.max_retained:
+            for job_id in [jid for jid, j in self._jobs.items() if j.finished_at]:
+                if len(self._jobs) < self.max_retained:
+                    break
+                del self._jobs[job_id]
+
+
+# Global instance
+job_manager = JobManager(
+    workers=Config.JOB_WORKERS,
+    result_ttl=Config.JOB_RESULT_TTL,
+    max_retained=Config.JOB_MAX_RETAINED,
+)
@@ -1,7 +1,12 @@
-import google.generativeai as genai
-import os
-from flask import current_app
+import logging
 from typing import Tuple, Optional, Dict
+from app.services.document_index import DocumentIndex
+from app.services.gemini_service import GeminiService
+from app.services.model_registry import model_registry
+from app.services.intent_router import intent_router
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
 
 class LLMService:
     """Service to handle LLM interactions and generated responses."""
@@ -9,9 +14,9 @@ class LLMService:
     @staticmethod
     def call_gemini_api(prompt: str) -> str:
         """Call Google Gemini API as a fallback."""
-        api_key = os.environ.get('GEMINI_API_KEY') or current_app.config.get('GEMINI_API_KEY')
+        model = model_registry.get('gemini-1.5-flash')
         
-        if not api_key:
+        if not model:
             return (
                 "🎓 **Academic Assistance:**\n\n"
                 "I'm here to help! Please configure the `GEMINI_API_KEY` to enable "
@@ -23,27 +28,29 @@ class LLMService:
                 "• Study Schedules"
             )
 
-        try:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-1.5-flash')
-            
-            # University Mentor System Prompt
-            system_instruction = (
-                "You are UniMentor, a professional, encouraging, and knowledgeable university academic advisor and career counselor. "
-                "Your goal is to help students succeed academically and professionally. "
-                "Tone: Professional, empathetic, structured, and clear. Avoid slang but remain accessible. "
-                "Format: Use Markdown for readability (bullet points, bold text). "
-                "If analyzing a document, provide specific, constructive feedback. "
-                "If asked about careers, provide realistic and actionable roadmaps. "
-                "Always conclude with an encouraging or guiding follow-up question.\n\n"
-            )
-            
-            full_prompt = system_instruction + prompt
-            response = model.generate_content(full_prompt)
-            return response.text
-        except Exception as e:
-            print(f"Gemini API Error: {str(e)}")
-            return "⚠️ I'm having trouble connecting to my brain right now. Please try again later."
+        with metrics.span("llm_call") as span:
+            try:
+                # University Mentor System Prompt
+                system_instruction = (
+                    "You are UniMentor, a professional, encouraging, and knowledgeable university academic advisor and career counselor. "
+                    "Your goal is to help students succeed academically and professionally. "
+                    "Tone: Professional, empathetic, structured, and clear. Avoid slang but remain accessible. "
+                    "Format: Use Markdown for readability (bullet points, bold text). "
+                    "If analyzing a document, provide specific, constructive feedback. "
+                    "If asked about careers, provide realistic and actionable roadmaps. "
+                    "Always conclude with an encouraging or guiding follow-up question.\n\n"
+                )
+
+                full_prompt = system_instruction + prompt
+                metrics.prompt_chars.observe(len(full_prompt), mode="llm")
+                # Shares GEMINI_MAX_CONCURRENCY and the rate limits with every other Gemini call
+                text = GeminiService.generate_text(model, full_prompt)
+                metrics.response_chars.observe(len(text), mode="llm")
+                return text
+            except Exception as e:
+                logger.error(f"Gemini API Error: {str(e)}")
+                span.outcome = "error"
+                return "⚠️ I'm having trouble connecting to my brain right now. Please try again later."
 
     @staticmethod
     def handle_llm_query(prompt: str) -> str:
@@ -51,23 +58,23 @@ class LLMService:
         Handle LLM queries with a fallback response.
         If no static rule matches, use Gemini API.
         """
-        prompt_lower = prompt.lower()
+        intents = intent_router.match(prompt)
         
         # Bypass static responses for direct analysis requests (coming from internal methods)
         if prompt.strip().startswith("Please analyze") or prompt.strip().startswith("Generate"):
              return LLMService.call_gemini_api(prompt)
         
-        if "career" in prompt_lower:
+        if "career" in intents:
             return LLMService.generate_career_response(prompt)
-        elif "resume" in prompt_lower:
+        elif "resume" in intents:
             return LLMService.generate_resume_response(prompt)
-        elif "interview" in prompt_lower:
+        elif "interview" in intents:
             return LLMService.generate_interview_response(prompt)
-        elif "project" in prompt_lower:
+        elif "project" in intents:
             return LLMService.generate_project_response(prompt)
-        elif "timetable" in prompt_lower or "schedule" in prompt_lower:
+        elif "schedule" in intents:
             return LLMService.generate_schedule_response(prompt)
-        elif "backlog" in prompt_lower:
+        elif "backlog" in intents:
             return LLMService.generate_backlog_response(prompt)
         else:
             # Fallback to Gemini instead of general static response
@@ -168,11 +175,11 @@ class LLMService:
     
     @staticmethod
     def enhanced_career_query(message: str, last_domain: Optional[str] = None) -> Tuple[str, Optional[str]]:
-        message_lower = message.lower()
+        intents = intent_router.match(message)
         
         # Career roadmap queries
-        if "roadmap" in message_lower or "path" in message_lower:
-            if "software" in message_lower or "programming" in message_lower:
+        if "roadmap" in intents:
+            if "software" in intents:
                 return (
                     """
 🛣️ **Software Development Career Roadmap:**
@@ -204,7 +211,7 @@ class LLMService:
                     """.strip(), 
                     "software"
                 )
-            elif "data" in message_lower or "analytics" in message_lower:
+            elif "data" in intents:
                 return (
                     """
 📊 **Data Science Career Roadmap:**
@@ -237,7 +244,7 @@ class LLMService:
                 )
 
         # Job search queries
-        elif "job" in message_lower and ("search" in message_lower or "find" in message_lower):
+        elif "job" in intents and "search" in intents:
             return (
                 """
 🔍 **Job Search Strategy:**
@@ -271,7 +278,7 @@ class LLMService:
             )
 
         # Salary and compensation
-        elif "salary" in message_lower or "compensation" in message_lower:
+        elif "salary" in intents:
             return (
                  """
 💰 **Career Compensation Guide:**
@@ -340,9 +347,9 @@ How can I help you with a specific aspect of your career journey?
 
     @staticmethod
     def enhanced_resume_query(message: str) -> str:
-        message_lower = message.lower()
+        intents = intent_router.match(message)
         
-        if "format" in message_lower or "template" in message_lower:
+        if "format" in intents:
             return """
 📝 **Resume Format & Template Guide:**
 
@@ -381,7 +388,7 @@ How can I help you with a specific aspect of your career journey?
 Would you like me to generate a resume outline for your specific field?
             """.strip()
 
-        elif "skills" in message_lower:
+        elif "skills" in intents:
             return """
 🛠️ **Skills Section Optimization:**
 
@@ -413,7 +420,7 @@ Would you like me to generate a resume outline for your specific field?
 • Finance: Excel, financial modeling, regulatory knowledge
             """.strip()
 
-        elif "experience" in message_lower or "work" in message_lower:
+        elif "experience" in intents:
             return """
 💼 **Work Experience Section Guide:**
 
@@ -442,7 +449,7 @@ Would you like me to generate a resume outline for your specific field?
 • Include relevant coursework if applicable
             """.strip()
 
-        elif "ats" in message_lower or "applicant tracking" in message_lower:
+        elif "ats" in intents:
             return """
 🤖 **ATS (Applicant Tracking System) Optimization:**
 
@@ -513,9 +520,9 @@ Upload your resume for personalized feedback!
 
     @staticmethod
     def enhanced_interview_query(message: str) -> str:
-        message_lower = message.lower()
+        intents = intent_router.match(message)
         
-        if "technical" in message_lower:
+        if "technical" in intents:
             return """
 💻 **Technical Interview Preparation:**
 
@@ -555,7 +562,7 @@ Upload your resume for personalized feedback!
 • "Walk me through your approach to..."
             """.strip()
 
-        elif "behavioral" in message_lower:
+        elif "behavioral" in intents:
             return """
 🗣️ **Behavioral Interview Preparation:**
 
@@ -588,7 +595,7 @@ Upload your resume for personalized feedback!
 • Time management and prioritization
             """.strip()
 
-        elif "questions" in message_lower and "ask" in message_lower:
+        elif "questions" in intents and "ask" in intents:
             return """
 ❓ **Questions to Ask the Interviewer:**
 
@@ -669,10 +676,10 @@ Upload your resume for personalized feedback!
 
     @staticmethod
     def handle_general_query(message: str) -> str:
-        message_lower = message.lower()
+        intents = intent_router.match(message)
         
         # Study-related queries
-        if any(word in message_lower for word in ["study", "learn", "education", "academic"]):
+        if "study" in intents:
             return """
 📚 **Academic Success Tips:**
 
@@ -708,7 +715,7 @@ How can I help you with your specific academic goals?
             """.strip()
         
         # Motivation and productivity
-        elif any(word in message_lower for word in ["motivation", "productivity", "focus", "procrastination"]):
+        elif "motivation" in intents:
             return """
 🚀 **Motivation & Productivity Tips:**
 
@@ -783,8 +790,11 @@ Please let me know what specific area you'd like help with, and I'll provide det
         if not context:
             return "❌ No PDF context available. Please upload a PDF first."
         
-        # Truncate context if too long
-        truncated_context = context[:context_length] if len(context) > context_length else context
+        # Keep only the chunks relevant to the query if the document is too long
+        if len(context) > context_length:
+            truncated_context = DocumentIndex.build(context).select_context(query, char_budget=context_length)
+        else:
+            truncated_context = context
         
         # Create enhanced prompt with PDF context
         enhanced_prompt = f"""
@@ -1,7 +1,14 @@
 
 from app.services.gemini_service import GeminiService
 from app.services.pdf_manager import PDFManager
+from app.services.document_store import Document
+from app.services.intent_router import intent_router
+from app.services.answer_store import answer_store
+from app.services.semantic_cache import semantic_cache
+from app.services.prompt_builder import prompt_builder
+from app.services.metrics import metrics
 import logging
+from typing import Iterator, Optional, Union
 
 logger = logging.getLogger(__name__)
 
@@ -22,63 +29,151 @@ class MentorService:
         "Always conclude with an encouraging or guiding follow-up question."
     )
 
+    # Recent exchanges included in chat prompts
+    CHAT_HISTORY_EXCHANGES = 5
+
     @staticmethod
     def process_request(user_message: str, state) -> str:
         """
         Main entry point for processing a user message.
         Decides whether to use specific services (PDF, Advisory) or the LLM.
         """
-        message_lower = user_message.lower().strip()
-        
-        # 1. Check for PDF-Specific Actions (if file is loaded)
-        if state.pdf_text:
-            if any(kw in message_lower for kw in ["analyze", "review", "critique", "evaluate"]):
-                if "resume" in message_lower or state.loaded_file_type == "resume":
-                    return MentorService.analyze_document(state.pdf_text, "resume")
+        direct_reply = MentorService.route_direct_reply(user_message, state)
+        if direct_reply is not None:
+            return direct_reply
+
+        use_cache = semantic_cache.is_eligible(user_message, state)
+        history = MentorService.rendered_history(state) if use_cache else ""
+        if use_cache:
+            cached = semantic_cache.get(user_message, history)
+            if cached is not None:
+                metrics.routes.inc(route="semantic_cache")
+                return cached
+
+        metrics.routes.inc(route="gemini")
+        bot_response = GeminiService.generate_response(MentorService.build_chat_prompt(user_message, state))
+        if use_cache and not GeminiService.is_error_response(bot_response):
+            semantic_cache.put(user_message, bot_response, history)
+        return bot_response
+
+    @staticmethod
+    def stream_request(user_message: str, state) -> Iterator[str]:
+        """
+        Streaming variant of process_request.
+        Direct replies are yielded whole; mentor chat is streamed from Gemini.
+        """
+        direct_reply = MentorService.route_direct_reply(user_message, state)
+        if direct_reply is not None:
+            yield direct_reply
+            return
+
+        use_cache = semantic_cache.is_eligible(user_message, state)
+        history = MentorService.rendered_history(state) if use_cache else ""
+        if use_cache:
+            cached = semantic_cache.get(user_message, history)
+            if cached is not None:
+                metrics.routes.inc(route="semantic_cache")
+                yield cached
+                return
+
+        metrics.routes.inc(route="gemini")
+        parts = []
+        for chunk in GeminiService.stream_response(MentorService.build_chat_prompt(user_message, state)):
+            parts.append(chunk)
+            yield chunk
+
+        bot_response = "".join(parts)
+        if use_cache and not GeminiService.is_error_response(bot_response):
+            semantic_cache.put(user_message, bot_response, history)
+
+    @staticmethod
+    def route_direct_reply(user_message: str, state) -> Optional[str]:
+        """handle_direct_reply, timed as the routing span and counted by route."""
+        with metrics.span("mentor_route") as span:
+            direct_reply = MentorService.handle_direct_reply(user_message, state)
+            span.outcome = "direct" if direct_reply is not None else "fallthrough"
+        if direct_reply is not None:
+            metrics.routes.inc(route="direct")
+        return direct_reply
+
+    @staticmethod
+    def handle_direct_reply(user_message: str, state) -> Optional[str]:
+        """
+        Returns a reply that does not need a free-form Gemini chat turn, if any:
+        PDF actions (analyze, summarize, notes) or a canned answer.
+        """
+        # 1. Check for PDF-Specific Actions on the active document (if one is loaded)
+        # The Document is passed on, so big PDFs are read page by page rather than as one string
+        document = state.active_ref.document if state.documents else None
+        if document is not None and document.char_count != 0:
+            intents = intent_router.match(user_message)
+
+            if "analyze" in intents:
+                if "resume" in intents or state.loaded_file_type == "resume":
+                    return MentorService.analyze_document(document, "resume")
                 else:
-                    return MentorService.analyze_document(state.pdf_text, "general")
+                    return MentorService.analyze_document(document, "general")
 
-            if any(kw in message_lower for kw in ["summarize", "summary", "overview"]):
-                return PDFManager.generate_summary(state.pdf_text, save_to_file=False) # Simplified call
+            if "summary" in intents:
+                return PDFManager.generate_summary(document, save_to_file=False) # Simplified call
             
-            if any(kw in message_lower for kw in ["notes", "study material"]):
-                return PDFManager.generate_notes(state.pdf_text)
-
-        # 2. Check for Career/Academic Static Logic (Legacy AdvisoryService)
-        # We check this briefly, but prefer Gemini if the query is complex.
-        # Simple keyword matching:
-        # if "timetable" in message_lower or "schedule" in message_lower:
-        #     return AdvisoryService.generate_schedule_response(user_message)
-        
-        # 3. Default: Chat with Gemini (The Mentor Persona)
-        # Construct the context-aware prompt
-        
+            if "notes" in intents:
+                return PDFManager.generate_notes(document)
+
+        # 2. Check for Career/Academic Static Logic (canned answer store)
+        # Only close paraphrases of known questions are served locally; anything
+        # more specific (or about an attached document) still goes to Gemini.
+        if not state.documents:
+            static_answer = answer_store.lookup(user_message)
+            if static_answer is not None:
+                return static_answer
+
+        return None
+
+    @staticmethod
+    @metrics.timed("prompt_build")
+    def build_chat_prompt(user_message: str, state) -> str:
+        """
+        Default: Chat with Gemini (The Mentor Persona). Builds the context-aware prompt,
+        trimming document context and history to the model's token budget.
+        """
+        # Add the chunks most relevant to the question, from every document in the workspace
+        snippet = state.select_context(user_message) if state.documents else None
+
+        student_str = f"\n\nStudent: {user_message}\nUniMentor:"
+        snippet, history = prompt_builder.fit(
+            fixed_text=MentorService.SYSTEM_PROMPT + student_str,
+            context=snippet,
+            history=state.get_recent_exchanges(num_exchanges=MentorService.CHAT_HISTORY_EXCHANGES),
+            model_name=GeminiService.get_model_name(),
+        )
+
         context_str = ""
-        if state.pdf_text:
-            # Add a snippet of the PDF context if available, or just mention it's loaded
-            context_str = f"\n\n[Attached Document Context]:\n{state.pdf_text[:3000]}...\n(End of Context)"
-        
+        if snippet:
+            context_str = f"\n\n[Attached Document Context]:\n{snippet}...\n(End of Context)"
+
         # Get Conversation History
-        history_context = state.get_recent_context(num_exchanges=5)
-        if history_context:
-            history_context = f"\n\n[Conversation History]:\n{history_context}"
-        else:
-            history_context = ""
+        history_context = ""
+        if history:
+            history_context = "\n\n[Conversation History]:\n" + "\n".join(history)
 
         # Combine System Prompt + Context + History + User Message
-        full_prompt = (
+        return (
             f"{MentorService.SYSTEM_PROMPT}\n"
             f"{context_str}"
-            f"{history_context}\n\n"
-            f"Student: {user_message}\n"
-            f"UniMentor:"
+            f"{history_context}"
+            f"{student_str}"
         )
 
-        return GeminiService.generate_response(full_prompt)
-
     @staticmethod
-    def analyze_document(text_content: str, doc_type: str) -> str:
+    def analyze_document(text_content: Union[str, Document], doc_type: str) -> str:
         """Specific prompt for deep analysis"""
+        if isinstance(text_content, Document):
+            # Only a resume needs the whole text; a general analysis reads just the opening pages
+            text_content = (text_content.text if doc_type == "resume" else text_content.head(5000)) or ""
+        # The general prompt only sends the first 5000 chars, so that is the cache identity
+        document = text_content if doc_type == "resume" else text_content[:5000]
+
         if doc_type == "resume":
             prompt = (
                 f"{MentorService.SYSTEM_PROMPT}\n\n"
@@ -90,7 +185,7 @@ class MentorService:
             prompt = (
                 f"{MentorService.SYSTEM_PROMPT}\n\n"
                 f"Task: Analyze the following ACADEMIC DOCUMENT. Summarize key points and explain difficult concepts.\n\n"
-                f"Document Content:\n{text_content[:5000]}\n"
+                f"Document Content:\n{document}\n"
             )
         
-        return GeminiService.generate_response(prompt)
+        return GeminiService.generate_cached_response(prompt, task=f"analyze:{doc_type}", document=document)
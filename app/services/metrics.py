@@ -0,0 +1,258 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Seconds; from a cache hit up to a slow multi-retry Gemini call
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Characters; from a one-line question up to a full document prompt
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Histogram:
+    """Cumulative-bucket histogram with fixed label names, in the Prometheus model."""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float], label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.label_names = tuple(label_names)
+        # label values -> [per-bucket counts..., +Inf count], sum
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[key] = series
+            counts, total = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            total[0] += value
+
+    def samples(self) -> Iterator[Sample]:
+        with self._lock:
+            snapshot = [(key, list(counts), total[0]) for key, (counts, total) in self._series.items()]
+
+        for key, counts, total in sorted(snapshot):
+            labels = dict(zip(self.label_names, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, 'le': _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Counter:
+    """Monotonic counter with fixed label names."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name if name.endswith("_total") else f"{name}_total"
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[Sample]:
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        for key, value in snapshot:
+            yield self.name, dict(zip(self.label_names, key)), value
+
+
+class _Span:
+    """Handle yielded by MetricsRegistry.span(); set outcome to label the observation."""
+
+    __slots__ = ('outcome',)
+
+    def __init__(self):
+        self.outcome = "ok"
+
+
+class MetricsRegistry:
+    """
+    In-process metrics in Prometheus text format (no client library needed).
+    Hot paths record spans and sizes here; values owned by other services
+    (cache hit counts, session store size) are read by collectors at scrape time.
+    """
+
+    def __init__(self, prefix: str = "unimentor"):
+        self.prefix = prefix
+        self._metrics: Dict[str, object] = {}
+        self._collectors: List[Callable[[], List[Tuple[str, str, str, List[Sample]]]]] = []
+        self._lock = threading.Lock()
+
+        self.spans = self.histogram(
+            "span_duration_seconds", "Time spent in instrumented hot-path sections.",
+            LATENCY_BUCKETS, ("span", "outcome"),
+        )
+        self.prompt_chars = self.histogram(
+            "prompt_chars", "Size of prompts sent to Gemini, in characters.", SIZE_BUCKETS, ("mode",),
+        )
+        self.response_chars = self.histogram(
+            "response_chars", "Size of Gemini responses, in characters.", SIZE_BUCKETS, ("mode",),
+        )
+        self.routes = self.counter(
+            "chat_routes", "How chat turns were answered (direct reply, semantic cache or Gemini).", ("route",),
+        )
+        self.http_requests = self.histogram(
+            "http_request_duration_seconds", "Time to produce a response (first byte for streams).",
+            LATENCY_BUCKETS, ("endpoint", "method", "status"),
+        )
+
+    def _full_name(self, name: str) -> str:
+        return f"{self.prefix}_{name}" if self.prefix else name
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float],
+                  label_names: Sequence[str] = ()) -> Histogram:
+        with self._lock:
+            metric = Histogram(self._full_name(name), help_text, buckets, label_names)
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        with self._lock:
+            metric = Counter(self._full_name(name), help_text, label_names)
+            self._metrics[metric.name] = metric
+            return metric
+
+    def register_collector(self, collector: Callable[[], List[Tuple[str, str, str, List[Sample]]]]) -> None:
+        """collector() returns [(name, type, help, samples)] and is called on every scrape."""
+        self._collectors.append(collector)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[_Span]:
+        """Times a block; the outcome is 'error' if it raises, else whatever the caller set."""
+        handle = _Span()
+        started = time.perf_counter()
+        try:
+            yield handle
+        except GeneratorExit:
+            # A streaming consumer went away before the end
+            handle.outcome = "cancelled"
+            raise
+        except BaseException:
+            handle.outcome = "error"
+            raise
+        finally:
+            self.spans.observe(time.perf_counter() - started, span=name, outcome=handle.outcome)
+
+    def timed(self, name: str) -> Callable:
+        """Decorator form of span() for whole functions."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        for metric in metrics:
+            kind = "histogram" if isinstance(metric, Histogram) else "counter"
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {kind}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                full_name = self._full_name(name)
+                lines.append(f"# HELP {full_name} {help_text}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                for sample_name, labels, value in samples:
+                    lines.append(f"{self._full_name(sample_name)}{_format_labels(labels)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _service_stats() -> List[Tuple[str, str, str, List[Sample]]]:
+    """Cache hit ratios and session store size, read from the owning services."""
+    # Avoid circular import
+    from app.services.text_cache import pdf_text_cache
+    from app.services.response_cache import response_cache
+    from app.services.semantic_cache import semantic_cache
+    from app.services.answer_store import answer_store
+    from app.services.pdf_export import pdf_exporter
+    from app.services.chat_manager import chat_manager
+    from app.services.document_store import document_corpus
+    from app.services.paged_pdf import page_cache
+
+    caches = {
+        'pdf_text': pdf_text_cache,
+        'response': response_cache,
+        'semantic': semantic_cache,
+        'answer_store': answer_store,
+        'pdf_export': pdf_exporter,
+        'pdf_pages': page_cache,
+    }
+    hits, misses, ratios = [], [], []
+    for cache_name, cache in caches.items():
+        labels = {'cache': cache_name}
+        hits.append(("cache_hits_total", labels, cache.hits))
+        misses.append(("cache_misses_total", labels, cache.misses))
+        lookups = cache.hits + cache.misses
+        ratios.append(("cache_hit_ratio", labels, cache.hits / lookups if lookups else 0.0))
+
+    sessions = chat_manager.stats()
+    corpus = document_corpus.stats()
+    return [
+        ("cache_hits_total", "counter", "Cache lookups that were served from the cache.", hits),
+        ("cache_misses_total", "counter", "Cache lookups that missed.", misses),
+        ("cache_hit_ratio", "gauge", "Hits / lookups since start.", ratios),
+        ("sessions", "gauge", "Sessions held in memory.", [("sessions", {}, sessions['sessions'])]),
+        ("session_store_bytes", "gauge", "Estimated memory held by in-memory sessions.",
+         [("session_store_bytes", {}, sessions['bytes'])]),
+        ("session_evictions_total", "counter", "Sessions evicted by the LRU limits.",
+         [("session_evictions_total", {}, sessions['evictions'])]),
+        ("session_expirations_total", "counter", "Sessions expired after the idle TTL.",
+         [("session_expirations_total", {}, sessions['expirations'])]),
+        ("corpus_documents", "gauge", "Unique documents referenced by sessions.",
+         [("corpus_documents", {}, corpus['documents'])]),
+        ("corpus_resident_bytes", "gauge", "Document text and indexes held in memory.",
+         [("corpus_resident_bytes", {}, corpus['bytes'])]),
+        ("corpus_dedup_hits_total", "counter", "Uploads that reused an existing document.",
+         [("corpus_dedup_hits_total", {}, corpus['dedup_hits'])]),
+    ]
+
+
+# Global instance
+metrics = MetricsRegistry()
+metrics.register_collector(_service_stats)
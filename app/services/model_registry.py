@@ -0,0 +1,72 @@
+import logging
+import os
+import threading
+from typing import Dict, Iterable, Optional
+
+import google.generativeai as genai
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """
+    Process-wide pool of Gemini clients.
+    genai.configure() runs once per API key and each named GenerativeModel is
+    built once and reused by every thread, so the hot path never pays setup cost.
+    """
+
+    def __init__(self):
+        self._models: Dict[str, genai.GenerativeModel] = {}
+        self._api_key: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def resolve_api_key() -> Optional[str]:
+        api_key = os.environ.get('GEMINI_API_KEY')
+        if not api_key and has_app_context():
+            api_key = current_app.config.get('GEMINI_API_KEY')
+        return api_key
+
+    def ensure_configured(self) -> bool:
+        """Configures the SDK on first use (or when the key changes). Returns False without a key."""
+        api_key = self.resolve_api_key()
+        if not api_key:
+            return False
+        if api_key == self._api_key:
+            return True
+
+        with self._lock:
+            if api_key != self._api_key:
+                genai.configure(api_key=api_key)
+                self._api_key = api_key
+                # Clients built with the old key must not be reused
+                self._models.clear()
+        return True
+
+    def get(self, model_name: str) -> Optional[genai.GenerativeModel]:
+        """Returns the shared client for model_name, creating it lazily."""
+        if not self.ensure_configured():
+            return None
+
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is None:
+                model = genai.GenerativeModel(model_name)
+                self._models[model_name] = model
+            return model
+
+    def warm(self, model_names: Iterable[str]) -> None:
+        """Pre-builds clients so the first request does not pay for it."""
+        for model_name in model_names:
+            try:
+                self.get(model_name)
+            except Exception as e:
+                logger.warning(f"Could not warm model {model_name}: {e}")
+
+
+# Global instance
+model_registry = ModelRegistry()
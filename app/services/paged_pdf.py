@@ -0,0 +1,296 @@
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import Config
+from app.services.metrics import metrics
+from app.services.text_cache import pdf_text_cache
+
+logger = logging.getLogger(__name__)
+
+PageKey = Tuple[str, int]
+
+
+class PageCache:
+    """
+    Process-wide LRU of extracted page text, bounded in bytes.
+    Keys are (document id, page number), so identical PDFs share pages.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[PageKey, str]" = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: PageKey) -> Optional[str]:
+        with self._lock:
+            text = self._entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def __contains__(self, key: PageKey) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key: PageKey, text: str) -> None:
+        size = len(text)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._current_bytes -= len(old)
+            self._entries[key] = text
+            self._current_bytes += size
+            while self._current_bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._current_bytes -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+
+
+class PagedPDF:
+    """
+    Lazy page-level view of a stored PDF.
+    Opening only parses the page tree; page text is extracted on demand and kept
+    in the shared page cache, so memory does not grow with the page count.
+    """
+
+    def __init__(self, doc_id: str, path: str):
+        self.doc_id = doc_id
+        self.path = path
+        self._reader = None
+        self._file = None
+        self._page_count: Optional[int] = None
+        # PyPDF2 readers are not thread-safe
+        self._lock = threading.Lock()
+
+    def _open(self):
+        if self._reader is None:
+            import PyPDF2
+            from app.services.pdf_manager import PDFManager
+
+            self._file = PDFManager._map_file(self.path)
+            self._reader = PyPDF2.PdfReader(self._file)
+            self._page_count = len(self._reader.pages)
+            weakref.finalize(self, self._file.close)
+        return self._reader
+
+    def available(self) -> bool:
+        """Whether pages can be read: already open (the mapping outlives the file) or still stored."""
+        return self._reader is not None or os.path.exists(self.path)
+
+    @property
+    def page_count(self) -> int:
+        if self._page_count is None:
+            with self._lock:
+                try:
+                    self._open()
+                except Exception as e:
+                    logger.error(f"Could not open {self.path}: {e}")
+                    self._page_count = 0
+        return self._page_count
+
+    def page(self, page_no: int) -> str:
+        """Text of one page (0-based), from the page cache when possible."""
+        key = (self.doc_id, page_no)
+        text = page_cache.get(key)
+        if text is not None:
+            return text
+
+        with metrics.span("pdf_page_extract") as span, self._lock:
+            try:
+                text = self._open().pages[page_no].extract_text() or ""
+            except Exception as e:
+                logger.error(f"Could not extract page {page_no} of {self.doc_id[:12]}: {e}")
+                span.outcome = "error"
+                return ""
+        page_cache.put(key, text)
+        return text
+
+    def iter_pages(self, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+        """
+        Yields page texts in order without holding more than a few at a time.
+        Long runs of uncached pages are extracted ahead on the PDF process pool.
+        """
+        end = self.page_count if end is None else min(end, self.page_count)
+        workers = Config.PDF_EXTRACT_WORKERS
+        if workers > 1 and end - start >= Config.PDF_PARALLEL_MIN_PAGES:
+            yield from self._iter_pages_parallel(start, end, workers)
+            return
+        for page_no in range(start, end):
+            yield self.page(page_no)
+
+    def _iter_pages_parallel(self, start: int, end: int, workers: int) -> Iterator[str]:
+        from concurrent.futures.process import BrokenProcessPool
+        from app.services.pdf_manager import _reset_page_pool, _submit_page_range
+
+        range_size = max(1, Config.PDF_PARALLEL_MIN_PAGES // 2)
+        ranges = [(s, min(s + range_size, end)) for s in range(start, end, range_size)]
+        in_flight: "OrderedDict[Tuple[int, int], object]" = OrderedDict()  # range -> (pool, future) or None
+        next_range = 0
+
+        # Keep a bounded window of ranges in flight so results never pile up
+        while next_range < len(ranges) or in_flight:
+            while next_range < len(ranges) and len(in_flight) < workers * 2:
+                range_start, range_end = ranges[next_range]
+                # Ranges whose ends are cached are most likely cached throughout; read those serially
+                submitted = None
+                if (self.doc_id, range_start) not in page_cache or (self.doc_id, range_end - 1) not in page_cache:
+                    try:
+                        submitted = _submit_page_range(self.path, range_start, range_end)
+                    except Exception as e:
+                        logger.warning(f"Could not submit pages {range_start}-{range_end} for parallel extraction: {e}")
+                in_flight[ranges[next_range]] = submitted
+                next_range += 1
+
+            (range_start, range_end), submitted = in_flight.popitem(last=False)
+            if submitted is None:
+                for page_no in range(range_start, range_end):
+                    yield self.page(page_no)
+                continue
+            pool, future = submitted
+            try:
+                texts = future.result()
+            except Exception as e:
+                logger.warning(f"Parallel page extraction failed, falling back to serial: {e}")
+                if isinstance(e, BrokenProcessPool):
+                    _reset_page_pool(pool)
+                texts = [self.page(page_no) for page_no in range(range_start, range_end)]
+            for offset, text in enumerate(texts):
+                page_cache.put((self.doc_id, range_start + offset), text)
+                yield text
+
+    def full_text(self) -> str:
+        """The whole document as one string (only for callers that really need it)."""
+        text = pdf_text_cache.get(self.doc_id)
+        if text is None:
+            text = "\n".join(text for text in self.iter_pages() if text).strip()
+            self.cache_text(text)
+        return text
+
+    def cache_text(self, text: str) -> None:
+        """Stores the extracted text under the PDF's content hash (doc_id), like PDFManager.extract_text."""
+        if self.doc_id not in pdf_text_cache:
+            pdf_text_cache.put(self.doc_id, text)
+
+    def head(self, max_chars: int) -> str:
+        """Opening text up to max_chars, reading only as many pages as needed."""
+        parts: List[str] = []
+        used = 0
+        for page_no in range(self.page_count):
+            text = self.page(page_no)
+            if not text:
+                continue
+            parts.append(text)
+            used += len(text) + 1
+            if used >= max_chars:
+                break
+        return "\n".join(parts).strip()[:max_chars]
+
+
+class PDFStore:
+    """
+    Content-addressed folder of uploaded PDFs (named by SHA-256), so documents can be
+    read page by page after the upload request has finished. Files of documents no
+    session references any more are deleted, oldest first, past max_bytes.
+
+    The folder is shared by every worker, but only this process's sessions are
+    visible here. Files are therefore also kept while they were used within
+    min_age seconds (sessions mark theirs on every turn via touch()), which should
+    be at least as long as sessions are kept anywhere.
+    """
+
+    # Seconds between mtime updates for the same file
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, folder: str, max_bytes: int, min_age: float):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+
+    def path_for(self, doc_id: str) -> str:
+        return os.path.join(self.folder, f"{doc_id}.pdf")
+
+    def find(self, doc_id: str) -> Optional[str]:
+        path = self.path_for(doc_id)
+        return path if os.path.exists(path) else None
+
+    def touch(self, doc_id: str) -> None:
+        """Marks a stored PDF as used by a session (rate-limited per file)."""
+        now = time.time()
+        if now - self._touched.get(doc_id, 0) < self.TOUCH_INTERVAL:
+            return
+        self._touched[doc_id] = now
+        try:
+            os.utime(self.path_for(doc_id))
+        except OSError:
+            pass
+
+    def adopt(self, spool_path: str, doc_id: str, in_use: Callable[[str], bool]) -> str:
+        """Moves a spooled upload into the store (or drops it if already stored); returns the stored path."""
+        os.makedirs(self.folder, exist_ok=True)
+        path = self.path_for(doc_id)
+        with self._lock:
+            if os.path.exists(path):
+                os.remove(spool_path)
+                os.utime(path)
+            else:
+                os.replace(spool_path, path)
+            self._enforce_limit(keep=path, in_use=in_use)
+        return path
+
+    def _enforce_limit(self, keep: str, in_use: Callable[[str], bool]) -> None:
+        try:
+            entries = []
+            for name in os.listdir(self.folder):
+                if name.endswith('.pdf'):
+                    full_path = os.path.join(self.folder, name)
+                    stat = os.stat(full_path)
+                    entries.append((stat.st_mtime, stat.st_size, full_path, name[:-len('.pdf')]))
+        except OSError as e:
+            logger.warning(f"Could not scan PDF store: {e}")
+            return
+
+        total = sum(size for _, size, _, _ in entries)
+        recent = time.time() - self.min_age
+        for mtime, size, full_path, doc_id in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if mtime >= recent:
+                # Everything after this is newer still; another worker's sessions may use it
+                logger.warning(f"PDF store over its limit ({total} bytes) with only recently used files left")
+                break
+            if full_path == keep or in_use(doc_id):
+                continue
+            try:
+                os.remove(full_path)
+                total -= size
+            except OSError:
+                continue
+
+
+# Global instances
+page_cache = PageCache(max_bytes=Config.PAGE_CACHE_MAX_BYTES)
+pdf_store = PDFStore(
+    folder=Config.PDF_STORE_FOLDER,
+    max_bytes=Config.PDF_STORE_MAX_BYTES,
+    # Sessions outlive the process in the database, but only the idle TTL in memory
+    min_age=Config.SESSION_DB_RETENTION if Config.SESSION_BACKEND == 'sqlite' else Config.SESSION_IDLE_TTL,
+)
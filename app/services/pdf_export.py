@@ -0,0 +1,210 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_styles = None
+
+
+def _get_styles():
+    """Paragraph style for exported summaries, built once per process."""
+    global _styles
+    if _styles is None:
+        from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+
+        base = getSampleStyleSheet()['Normal']
+        # spaceAfter replaces the Spacer flowable that used to follow every line
+        _styles = {'body': ParagraphStyle('SummaryBody', parent=base, spaceAfter=12)}
+    return _styles
+
+
+def _render_pdf(content: str, path: str) -> int:
+    """Process-pool worker: renders content to path atomically and returns the file size."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import Paragraph, SimpleDocTemplate
+
+    style = _get_styles()['body']
+    # Lines are plain text, so reportlab markup characters (&, <, >) must be escaped
+    story = [Paragraph(escape(line), style) for line in content.split('\n') if line.strip()]
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        SimpleDocTemplate(tmp_path, pagesize=letter).build(story)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return os.path.getsize(path)
+
+
+class PDFExporter:
+    """
+    Renders summaries to PDF off the request thread.
+    Jobs run on a process pool (reportlab is CPU-bound) and write into a bounded
+    export folder keyed by content hash, so identical content is rendered once and
+    concurrent requests for it share one render. The least recently served files
+    are deleted once the folder exceeds max_bytes or max_files.
+    """
+
+    def __init__(self, folder: str, max_bytes: int, max_files: int, workers: int):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(content: str) -> str:
+        return hashlib.sha256(content.encode('utf-8', 'surrogatepass')).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.folder, f"{key}.pdf")
+
+    @staticmethod
+    def download_url(key: str) -> str:
+        return f"/exports/{key}"
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Not fork: by now this process runs threads, and forking those can deadlock the workers
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(method))
+        return self._pool
+
+    def _reset_pool(self, broken: ProcessPoolExecutor) -> None:
+        """Drops a pool whose worker died; the next submit starts a new one."""
+        with self._lock:
+            if self._pool is not broken:
+                return  # Already replaced
+            self._pool = None
+        logger.warning("PDF export pool broke (a worker died); starting a new one")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, content: str) -> Tuple[str, Future]:
+        """
+        Starts rendering content (unless it is cached or already rendering) and
+        returns (key, future). The future resolves to the file path.
+        """
+        key = self.key_for(content)
+        path = self.path_for(key)
+
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                return key, pending
+
+            if os.path.exists(path):
+                self.hits += 1
+                self._touch(path)
+                done: Future = Future()
+                done.set_result(path)
+                return key, done
+
+            self.misses += 1
+            os.makedirs(self.folder, exist_ok=True)
+            pool = self._get_pool()
+            try:
+                render = pool.submit(_render_pdf, content, path)
+            except BrokenProcessPool:
+                # A worker died since the last export; retry once on a fresh pool
+                self._pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = self._get_pool()
+                render = pool.submit(_render_pdf, content, path)
+            result: Future = Future()
+            self._pending[key] = result
+
+        render.add_done_callback(lambda f: self._finish(key, path, f, result, pool))
+        return key, result
+
+    def render(self, content: str, timeout: Optional[float] = None) -> str:
+        """Blocking form of submit(); returns the content key once the PDF exists."""
+        key, future = self.submit(content)
+        future.result(timeout=timeout)
+        return key
+
+    def status(self, key: str) -> str:
+        """'ready', 'pending' or 'missing' (never rendered, or evicted)."""
+        with self._lock:
+            if key in self._pending:
+                return 'pending'
+        return 'ready' if os.path.exists(self.path_for(key)) else 'missing'
+
+    def open_ready(self, key: str) -> Optional[str]:
+        """Path of a rendered PDF, marking it recently used; None if not available."""
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            return None
+        self._touch(path)
+        return path
+
+    def _finish(self, key: str, path: str, render: Future, result: Future, pool: ProcessPoolExecutor) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+        error = render.exception()
+        if error is not None:
+            logger.error(f"PDF export failed: {error}")
+            if isinstance(error, BrokenProcessPool):
+                self._reset_pool(pool)
+            result.set_exception(error)
+            return
+        self._enforce_limits(keep=path)
+        result.set_result(path)
+
+    @staticmethod
+    def _touch(path: str) -> None:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _enforce_limits(self, keep: str) -> None:
+        """Deletes the least recently used exports until the folder fits its bounds."""
+        try:
+            entries = []
+            for name in os.listdir(self.folder):
+                if not name.endswith('.pdf'):
+                    continue
+                full_path = os.path.join(self.folder, name)
+                stat = os.stat(full_path)
+                entries.append((stat.st_mtime, stat.st_size, full_path))
+        except OSError as e:
+            logger.warning(f"Could not scan export folder: {e}")
+            return
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for _, size, full_path in entries:
+            if total <= self.max_bytes and count <= self.max_files:
+                break
+            if full_path == keep:
+                continue
+            try:
+                os.remove(full_path)
+            except OSError:
+                continue
+            total -= size
+            count -= 1
+
+
+# Global instance
+pdf_exporter = PDFExporter(
+    folder=Config.PDF_EXPORT_FOLDER,
+    max_bytes=Config.PDF_EXPORT_MAX_BYTES,
+    max_files=Config.PDF_EXPORT_MAX_FILES,
+    workers=Config.PDF_EXPORT_WORKERS,
+)
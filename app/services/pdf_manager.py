@@ -1,65 +1,382 @@
 import io
+import itertools
 import os
-from typing import Optional, Union, Dict
+import hashlib
+import logging
+import mmap
+import multiprocessing
+import tempfile
+import threading
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, Optional, Union, Dict, List, Tuple
 from datetime import datetime
+from config import Config
 from app.services.gemini_service import GeminiService
+from app.services.text_cache import pdf_text_cache
+from app.services.metrics import metrics
+from app.services.pdf_export import pdf_exporter
+from app.services.document_store import Document, document_corpus
+from app.services.paged_pdf import PagedPDF, pdf_store
+
+logger = logging.getLogger(__name__)
+
+_page_pool: Optional[ProcessPoolExecutor] = None
+_page_pool_lock = threading.Lock()
+_index_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pdf-index")
+
+
+def _extract_page_range(pdf_source: Union[bytes, str], start: int, end: int) -> List[str]:
+    """Process-pool worker: extracts text for pages [start, end) of a PDF given as bytes or a path."""
+    import PyPDF2
+
+    pdf_file = io.BytesIO(pdf_source) if isinstance(pdf_source, bytes) else PDFManager._map_file(pdf_source)
+    try:
+        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        return [pdf_reader.pages[i].extract_text() or "" for i in range(start, end)]
+    finally:
+        pdf_file.close()
+
+
+def _get_page_pool() -> ProcessPoolExecutor:
+    """Lazily creates the shared process pool used for parallel page extraction."""
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            # Forking now would copy a process that already runs threads (Gemini loop, session
+            # writer), which can deadlock the children; forkserver starts them from a clean process
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _page_pool = ProcessPoolExecutor(
+                max_workers=Config.PDF_EXTRACT_WORKERS, mp_context=multiprocessing.get_context(method)
+            )
+        return _page_pool
+
+
+def _reset_page_pool(broken: ProcessPoolExecutor) -> None:
+    """Drops a page pool whose worker died; the next _get_page_pool() starts a new one."""
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is not broken:
+            return  # Already replaced
+        _page_pool = None
+    logger.warning("PDF page pool broke (a worker died); starting a new one")
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit_page_range(pdf_source: Union[bytes, str], start: int, end: int) -> Tuple[ProcessPoolExecutor, Future]:
+    """Submits a page range to the page pool, replacing the pool once if it broke since its last use."""
+    pool = _get_page_pool()
+    try:
+        return pool, pool.submit(_extract_page_range, pdf_source, start, end)
+    except BrokenProcessPool:
+        _reset_page_pool(pool)
+        pool = _get_page_pool()
+        return pool, pool.submit(_extract_page_range, pdf_source, start, end)
+
 
 class PDFManager:
     """Service to handle PDF file processing operation."""
 
     @staticmethod
-    def extract_text(pdf_data: Union[bytes, str]) -> str:
-        """Extract text from PDF file."""
-        try:
-            # Try to import PyPDF2 for PDF processing
+    def extract_text(pdf_data: Union[bytes, str], cache_key: Optional[str] = None) -> str:
+        """
+        Extract text from PDF file (bytes, or a path that is memory-mapped rather than read).
+        Served from the text cache when possible; byte input is hashed automatically,
+        path input is cached when the caller passes the content hash as cache_key.
+        """
+        with metrics.span("pdf_extract") as span:
+            if cache_key is None and isinstance(pdf_data, bytes):
+                cache_key = pdf_text_cache.key_for(pdf_data)
+            if cache_key:
+                cached_text = pdf_text_cache.get(cache_key)
+                if cached_text is not None:
+                    span.outcome = "cache_hit"
+                    return cached_text
+
             try:
-                import PyPDF2
-                
-                if isinstance(pdf_data, bytes):
-                    pdf_file = io.BytesIO(pdf_data)
-                else:
-                    pdf_file = open(pdf_data, 'rb')
-                
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                text = ""
+                # Try to import PyPDF2 for PDF processing
+                try:
+                    import PyPDF2
                 
-                for page in pdf_reader.pages:
-                    text_page = page.extract_text()
-                    if text_page:
-                        text += text_page + "\n"
+                    if isinstance(pdf_data, bytes):
+                        pdf_file = io.BytesIO(pdf_data)
+                    else:
+                        pdf_file = PDFManager._map_file(pdf_data)
                 
-                if isinstance(pdf_data, str):
-                    pdf_file.close()
-                    
-                return text.strip()
+                    pdf_reader = PyPDF2.PdfReader(pdf_file)
+                    try:
+                        pages = PDFManager._extract_pages(pdf_reader, pdf_data)
+                    finally:
+                        if isinstance(pdf_data, str):
+                            pdf_file.close()
+
+                    text = "\n".join(page_text for page_text in pages if page_text).strip()
+                    if cache_key:
+                        pdf_text_cache.put(cache_key, text)
+                    return text
                 
-            except ImportError:
-                # Fallback: Mock PDF text extraction if check fails
-                return """
-                This is a sample PDF content for development purposes. (PyPDF2 not found)
+                except ImportError:
+                    # Fallback: Mock PDF text extraction if check fails
+                    return """
+                    This is a sample PDF content for development purposes. (PyPDF2 not found)
                 
-                Key Points:
-                • Sample bullet point 1
-                • Sample bullet point 2
+                    Key Points:
+                    • Sample bullet point 1
+                    • Sample bullet point 2
                 
-                Please install PyPDF2 to enable real PDF extraction.
-                """
-        except Exception as e:
-            return f"Error extracting text from PDF: {str(e)}"
+                    Please install PyPDF2 to enable real PDF extraction.
+                    """
+            except Exception as e:
+                span.outcome = "error"
+                return f"Error extracting text from PDF: {str(e)}"
 
     @staticmethod
-    def generate_summary(context: str, save_to_file: bool = False, generate_pdf: bool = False) -> str:
-        """Generate a summary of the PDF content."""
-        if not context or not context.strip():
+    def open_document(pdf_data: Union[bytes, str], content_hash: Optional[str] = None) -> Document:
+        """
+        Returns the shared corpus Document for a PDF (bytes, or a spooled path with its hash).
+        A PDF that some session already uploaded is not parsed again.
+        """
+        if content_hash is None:
+            if not isinstance(pdf_data, bytes):
+                raise ValueError("content_hash is required for path input")
+            content_hash = pdf_text_cache.key_for(pdf_data)
+
+        document = document_corpus.get(content_hash)
+        if document is not None:
+            return document
+
+        text = PDFManager.extract_text(pdf_data, cache_key=content_hash)
+        if text.startswith("Error extracting text from PDF"):
+            # Not shared, so the next upload of the same file retries
+            return Document(content_hash, text)
+
+        # The text cache's disk layer can reload the text if the corpus unloads it
+        loader = (lambda: pdf_text_cache.get(content_hash)) if Config.PDF_TEXT_CACHE_DISK else None
+        return document_corpus.add(content_hash, text, loader=loader)
+
+    @staticmethod
+    def open_spooled(spool_path: str, content_hash: str) -> Document:
+        """
+        Takes ownership of a spooled upload and returns its lazy, page-level Document.
+        Nothing is extracted here: the PDF moves into the shared PDF store and pages
+        are read when something needs them, unless the text cache already has its text.
+        """
+        with metrics.span("pdf_extract") as span:
+            document = document_corpus.get(content_hash)
+            if document is not None:
+                os.remove(spool_path)
+                span.outcome = "dedup"
+                return document
+
+            path = pdf_store.adopt(spool_path, content_hash, in_use=document_corpus.is_live)
+            cached_text = pdf_text_cache.get(content_hash)
+            span.outcome = "cache_hit" if cached_text is not None else "paged"
+            return document_corpus.add_paged(content_hash, PagedPDF(content_hash, path), text=cached_text)
+
+    @staticmethod
+    def index_in_background(document: Document) -> Future:
+        """Builds the document's retrieval index off the request; a chat turn that needs it first waits."""
+        def build():
+            try:
+                document.index
+            except Exception as e:
+                logger.error(f"Indexing {document.doc_id[:12]} failed: {e}")
+        return _index_pool.submit(build)
+
+    @staticmethod
+    def _map_file(path: str) -> mmap.mmap:
+        """Read-only memory map of a file; pages are faulted in by the OS instead of copied."""
+        with open(path, 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def spool_upload(stream, chunk_size: int = 1024 * 1024) -> Tuple[str, str]:
+        """
+        Copies an upload stream to a temp file under UPLOAD_SPOOL_FOLDER in fixed-size
+        chunks, hashing as it goes. Returns (path, sha256) — the hash is the text cache key.
+        The caller is responsible for deleting the file.
+        """
+        os.makedirs(Config.UPLOAD_SPOOL_FOLDER, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, path = tempfile.mkstemp(suffix='.pdf', dir=Config.UPLOAD_SPOOL_FOLDER)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+        except Exception:
+            os.remove(path)
+            raise
+        return path, digest.hexdigest()
+
+    @staticmethod
+    def _extract_pages(pdf_reader, pdf_source: Union[bytes, str]) -> List[str]:
+        """
+        Returns the text of every page, in order.
+        Large documents are split into page ranges and parsed across a process pool;
+        small ones (or any pool failure) use the serial path.
+        """
+        page_count = len(pdf_reader.pages)
+        workers = Config.PDF_EXTRACT_WORKERS
+
+        if workers > 1 and page_count >= Config.PDF_PARALLEL_MIN_PAGES:
+            return PDFManager._extract_pages_parallel(pdf_reader, pdf_source, page_count, workers)
+
+        return [page.extract_text() or "" for page in pdf_reader.pages]
+
+    @staticmethod
+    def _extract_pages_parallel(pdf_reader, pdf_source: Union[bytes, str], page_count: int,
+                                workers: int) -> List[str]:
+        # Two ranges per worker keeps the pool busy when some pages are much heavier than others
+        range_size = max(1, -(-page_count // (workers * 2)))
+        ranges = [(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)]
+
+        submitted: List[Optional[Tuple[ProcessPoolExecutor, Future]]] = []
+        for start, end in ranges:
+            try:
+                submitted.append(_submit_page_range(pdf_source, start, end))
+            except Exception as e:
+                logger.warning(f"Could not submit pages {start}-{end} for parallel extraction: {e}")
+                submitted.append(None)
+
+        pages: List[str] = []
+        for (start, end), entry in zip(ranges, submitted):
+            if entry is not None:
+                pool, future = entry
+                try:
+                    pages.extend(future.result())
+                    continue
+                except Exception as e:
+                    logger.warning(f"Parallel extraction of pages {start}-{end} failed, falling back to serial: {e}")
+                    if isinstance(e, BrokenProcessPool):
+                        _reset_page_pool(pool)
+            pages.extend(pdf_reader.pages[i].extract_text() or "" for i in range(start, end))
+        return pages
+
+    @staticmethod
+    def _iter_sections(source: Union[str, Document], stats: Dict[str, int]) -> Iterator[str]:
+        """
+        Streams a document as sections of up to SUMMARY_MAP_CHARS, grouping whole pages.
+        Only the current section is held in memory; stats collects characters and words.
+
+        A document that fits in one prompt is one section. Longer ones are cut at
+        pages (or, for plain text, lines) picked by their content hash once a section
+        is half full, so editing a page only changes the sections around it and the
+        others keep their cached partial summaries.
+        """
+        if isinstance(source, Document) and source.pages is not None:
+            pages: Iterator[str] = source.iter_pages()
+        else:
+            text = source.text if isinstance(source, Document) else source
+            pages = iter((text or "").split("\n"))
+
+        limit = Config.SUMMARY_MAP_CHARS
+
+        def counted() -> Iterator[str]:
+            for page_text in pages:
+                if page_text and page_text.strip():
+                    stats['characters'] += len(page_text)
+                    stats['words'] += len(page_text.split())
+                    yield page_text
+
+        pages_iter = counted()
+        head: List[str] = []
+        head_size = 0
+        for page_text in pages_iter:
+            head.append(page_text)
+            head_size += len(page_text) + 1
+            if head_size > limit + 1:
+                break
+        else:
+            if head:
+                yield "\n".join(head)
+            return
+
+        parts: List[str] = []
+        size = 0
+        for page_text in itertools.chain(head, pages_iter):
+            if parts and size + len(page_text) > limit:
+                yield "\n".join(parts)
+                parts, size = [], 0
+            # Only pages longer than a whole section are split
+            while len(page_text) > limit:
+                yield page_text[:limit]
+                page_text = page_text[limit:]
+            parts.append(page_text)
+            size += len(page_text) + 1
+            # The cut chance grows with the unit's length, so sections average about 3/4 of the cap
+            # whether the units are pages or lines
+            if size >= limit // 2 and (zlib.crc32(page_text.encode('utf-8', 'surrogatepass')) % 1024) * limit < 4096 * len(page_text):
+                yield "\n".join(parts)
+                parts, size = [], 0
+        if parts:
+            yield "\n".join(parts)
+
+    @staticmethod
+    def _document_content(context: Union[str, Document]) -> Tuple[Optional[str], Iterator[str], Dict[str, int]]:
+        """
+        Returns (single_section, sections, stats) for a summary or notes run.
+        Documents that fit in one prompt come back as single_section (same prompt and
+        cache key as before); longer ones as a lazy iterator of sections.
+        """
+        stats = {'characters': 0, 'words': 0}
+        if isinstance(context, str):
+            # Already in memory, so count exactly (slicing can split words)
+            sections = PDFManager._iter_sections(context, {'characters': 0, 'words': 0})
+            stats = {'characters': len(context.strip()), 'words': len(context.split())}
+        else:
+            sections = PDFManager._iter_sections(context, stats)
+
+        first = next(sections, None)
+        second = next(sections, None) if first is not None else None
+        if second is None:
+            if isinstance(context, str) and first is not None:
+                # Keep the exact original text (and its cache key) for short documents
+                first = context[:Config.SUMMARY_MAP_CHARS]
+            return first, iter(()), stats
+
+        def all_sections() -> Iterator[str]:
+            yield first
+            yield second
+            yield from sections
+
+        return None, all_sections(), stats
+
+    @staticmethod
+    def _page_estimate(context: Union[str, Document], characters: int) -> int:
+        if isinstance(context, Document):
+            return max(1, context.page_count)
+        return max(1, characters // 2000)
+
+    @staticmethod
+    def generate_summary(context: Union[str, Document], save_to_file: bool = False, generate_pdf: bool = False) -> str:
+        """
+        Generate a summary of the PDF content (text, or a corpus Document read page by page).
+        Long documents are summarized section by section, several sections at a time
+        (map), then the partial summaries are combined (reduce), so no part of the
+        document is dropped and wall-clock time grows with length / SUMMARY_CONCURRENCY.
+        """
+        if context is None or (isinstance(context, str) and not context.strip()):
             return "❌ No PDF content available to summarize. Please upload a PDF first."
         
         try:
             # Avoid circular import
             from app.services.mentor_service import MentorService
             
-            # summary = LLMService.summarize_pdf_content(context)
-            prompt = f"{MentorService.SYSTEM_PROMPT}\n\nTask: Provide a comprehensive SUMMARY of this document.\nHighlight key concepts and takeaways.\n\nDocument Content:\n{context[:20000]}"
-            summary = GeminiService.generate_response(prompt)
+            single, sections, stats = PDFManager._document_content(context)
+            if stats['characters'] == 0:
+                return "❌ No PDF content available to summarize. Please upload a PDF first."
+
+            if single is not None:
+                # summary = LLMService.summarize_pdf_content(context)
+                prompt = f"{MentorService.SYSTEM_PROMPT}\n\nTask: Provide a comprehensive SUMMARY of this document.\nHighlight key concepts and takeaways.\n\nDocument Content:\n{single}"
+                summary = GeminiService.generate_cached_response(prompt, task="summary", document=single)
+            else:
+                summary = PDFManager._map_reduce_summary(sections, MentorService.SYSTEM_PROMPT)
             
             # Add metadata
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -71,9 +388,9 @@ class PDFManager:
 
 ---
 **📊 Document Statistics:**
-* Characters: {len(context):,}
-* Words: {len(context.split()):,}
-* Estimated pages: {max(1, len(context) // 2000)}
+* Characters: {stats['characters']:,}
+* Words: {stats['words']:,}
+* Estimated pages: {PDFManager._page_estimate(context, stats['characters'])}
             """.strip()
             
             # Save to file if requested
@@ -97,9 +414,96 @@ class PDFManager:
             return f"❌ Error generating summary: {str(e)}"
 
     @staticmethod
-    def generate_notes(context: str, topic_focus: Optional[str] = None) -> str:
-        """Generate study notes from PDF content."""
-        if not context or not context.strip():
+    def _map_reduce_summary(sections: Iterator[str], system_prompt: str) -> str:
+        """
+        Summarizes sections concurrently (map), then merges the partial summaries (reduce).
+        Each partial is cached by its section's content, so re-running on an edited
+        document only calls Gemini for the sections that changed.
+        """
+        map_task = (
+            f"{system_prompt}\n\nTask: Summarize this PART of a longer document.\n"
+            f"List its key concepts and takeaways concisely; they will be merged with the other parts.\n\n"
+            f"Document Content (one part):\n"
+        )
+        # The prompt depends only on the section, so the cache key (the section) identifies it
+        jobs = ((map_task + section, section) for section in sections)
+
+        partials: List[Tuple[str, str]] = []  # (label, partial summary)
+        for number, partial in enumerate(GeminiService.map_cached_responses(jobs, task="summary:map"), start=1):
+            if GeminiService.is_error_response(partial):
+                return partial
+            partials.append((f"Part {number}", partial))
+
+        return PDFManager._reduce_summaries(partials, system_prompt)
+
+    @staticmethod
+    def _reduce_summaries(partials: List[Tuple[str, str]], system_prompt: str) -> str:
+        """
+        Combines labelled partial summaries into one. While they do not fit in one
+        prompt, neighbouring partials are merged in groups (concurrently), level by level.
+        """
+        def joined(group: List[Tuple[str, str]]) -> str:
+            return "\n\n".join(f"[{label}]\n{text}" for label, text in group)
+
+        limit = Config.SUMMARY_MAP_CHARS
+        while len(partials) > 1 and len(joined(partials)) > limit:
+            # Consecutive groups that fit the prompt cap, at least two partials each so every level shrinks
+            groups: List[List[Tuple[str, str]]] = []
+            for partial in partials:
+                current = groups[-1] if groups else None
+                if current is None or (len(current) >= 2 and len(joined(current + [partial])) > limit):
+                    groups.append([partial])
+                else:
+                    current.append(partial)
+
+            # A trailing single partial is carried up to the next level as it is
+            merging = [group for group in groups if len(group) > 1]
+            jobs = []
+            for group in merging:
+                combined = joined(group)
+                prompt = (
+                    f"{system_prompt}\n\nTask: The following are summaries of consecutive parts of one document.\n"
+                    f"Combine them into one concise summary of this stretch of the document, keeping its key concepts;\n"
+                    f"it will be merged with the neighbouring stretches.\n\n"
+                    f"Part Summaries:\n{combined}"
+                )
+                jobs.append((prompt, combined))
+
+            merged = iter(list(GeminiService.map_cached_responses(jobs, task="summary:merge")))
+            next_level = []
+            for group in groups:
+                if len(group) == 1:
+                    next_level.append(group[0])
+                    continue
+                text = next(merged)
+                if GeminiService.is_error_response(text):
+                    return text
+                next_level.append((PDFManager._span_label(group), text))
+            partials = next_level
+
+        combined = joined(partials)
+        prompt = (
+            f"{system_prompt}\n\nTask: The following are summaries of consecutive parts of one document.\n"
+            f"Combine them into one comprehensive SUMMARY of the whole document.\n"
+            f"Highlight key concepts and takeaways, and keep the document's overall structure.\n\n"
+            f"Part Summaries:\n{combined}"
+        )
+        return GeminiService.generate_cached_response(prompt, task="summary:reduce", document=combined)
+
+    @staticmethod
+    def _span_label(group: List[Tuple[str, str]]) -> str:
+        """'Parts 1-4' for a merged group labelled 'Part 1' .. 'Parts 3-4'."""
+        first = group[0][0].split(' ', 1)[1].split('-')[0]
+        last = group[-1][0].split(' ', 1)[1].split('-')[-1]
+        return f"Parts {first}-{last}"
+
+    @staticmethod
+    def generate_notes(context: Union[str, Document], topic_focus: Optional[str] = None) -> str:
+        """
+        Generate study notes from PDF content (text, or a corpus Document read page by page).
+        Long documents get notes per section, read one section at a time.
+        """
+        if context is None or (isinstance(context, str) and not context.strip()):
             return "❌ No PDF content available for note generation."
         
         try:
@@ -108,8 +512,24 @@ class PDFManager:
             
             # notes = LLMService.generate_study_notes(context, topic_focus)
             focus_text = f"Focus specifically on: {topic_focus}" if topic_focus else "Cover all key topics."
-            prompt = f"{MentorService.SYSTEM_PROMPT}\n\nTask: Create detailed STUDY NOTES from this document.\n{focus_text}\nUse bullet points, bold key terms, and explain complex concepts clearly.\n\nDocument Content:\n{context[:20000]}"
-            notes = GeminiService.generate_response(prompt)
+            single, sections, stats = PDFManager._document_content(context)
+            if stats['characters'] == 0:
+                return "❌ No PDF content available for note generation."
+
+            if single is not None:
+                prompt = f"{MentorService.SYSTEM_PROMPT}\n\nTask: Create detailed STUDY NOTES from this document.\n{focus_text}\nUse bullet points, bold key terms, and explain complex concepts clearly.\n\nDocument Content:\n{single}"
+                notes = GeminiService.generate_cached_response(prompt, task="notes", document=single, focus=topic_focus)
+            else:
+                # Notes are additive, so the reduce step is concatenation in document order
+                notes_task = f"{MentorService.SYSTEM_PROMPT}\n\nTask: Create detailed STUDY NOTES from this PART of a longer document.\n{focus_text}\nUse bullet points, bold key terms, and explain complex concepts clearly.\n\nDocument Content (one part):\n"
+                jobs = ((notes_task + section, section) for section in sections)
+                parts = []
+                for number, part in enumerate(GeminiService.map_cached_responses(jobs, task="notes:map", focus=topic_focus), start=1):
+                    if GeminiService.is_error_response(part):
+                        parts.append(part)
+                        break
+                    parts.append(f"## Part {number}\n{part}")
+                notes = "\n\n".join(parts)
             
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             formatted_notes = f"""
@@ -121,9 +541,9 @@ class PDFManager:
 
 ---
 **📖 Source Document Info:**
-* Total characters: {len(context):,}
-* Total words: {len(context.split()):,}
-* Estimated reading time: {max(1, len(context.split()) // 200)} minutes
+* Total characters: {stats['characters']:,}
+* Total words: {stats['words']:,}
+* Estimated reading time: {max(1, stats['words'] // 200)} minutes
             """.strip()
             
             return formatted_notes
@@ -172,31 +592,23 @@ Generated on: {timestamp}
 
     @staticmethod
     def generate_summary_pdf(content: str) -> str:
-        """Generate a PDF file from summary content."""
+        """
+        Generate a PDF file from summary content.
+        Rendering runs on the export pool and identical content is served from the
+        export cache; returns the download link.
+        """
         try:
             # Try to import reportlab for PDF generation
             try:
-                from reportlab.lib.pagesizes import letter
-                from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-                from reportlab.lib.styles import getSampleStyleSheet
-                
-                filename = f"summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-                doc = SimpleDocTemplate(filename, pagesize=letter)
-                styles = getSampleStyleSheet()
-                story = []
-                
-                # Convert content to PDF paragraphs
-                for line in content.split('\n'):
-                    if line.strip():
-                        story.append(Paragraph(line, styles['Normal']))
-                        story.append(Spacer(1, 12))
-                
-                doc.build(story)
-                return f"📄 PDF generated: {filename}"
+                import reportlab  # noqa: F401
+
+                key = pdf_exporter.render(content, timeout=Config.PDF_EXPORT_TIMEOUT)
+                return f"📄 PDF generated: {pdf_exporter.download_url(key)}"
                 
             except ImportError:
                 # Fallback: Save as text file
-                filename = f"summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+                os.makedirs(Config.PDF_EXPORT_FOLDER, exist_ok=True)
+                filename = os.path.join(Config.PDF_EXPORT_FOLDER, f"{pdf_exporter.key_for(content)}.txt")
                 with open(filename, 'w', encoding='utf-8') as f:
                     f.write(content)
                 return f"📄 Text file generated: {filename} (Install reportlab for PDF generation)"
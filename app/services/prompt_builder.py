@@ -0,0 +1,64 @@
+from typing import List, Optional, Sequence, Tuple
+
+from config import Config
+from app.services.rate_limiter import estimate_tokens
+
+class PromptBuilder:
+    """
+    Fits the variable parts of a chat prompt (document context and history)
+    into a per-model token budget.
+
+    The system prompt and the student's message are always kept. Document
+    context may use up to `context_share` of what is left; the remainder is
+    filled with the most recent history exchanges, newest first.
+    """
+
+    def __init__(self, default_budget: int, model_budgets: dict, context_share: float):
+        self.default_budget = default_budget
+        self.model_budgets = model_budgets
+        self.context_share = context_share
+
+    @staticmethod
+    def cost(text: str) -> int:
+        return estimate_tokens(text) if text else 0
+
+    def budget_for(self, model_name: str) -> int:
+        # Model names come back as 'models/gemini-1.5-flash' or similar
+        for name, budget in self.model_budgets.items():
+            if model_name.endswith(name):
+                return budget
+        return self.default_budget
+
+    def fit(self, fixed_text: str, context: Optional[str], history: Sequence[str],
+            model_name: str = "") -> Tuple[Optional[str], List[str]]:
+        """
+        Returns (context, history) trimmed to the budget left after fixed_text.
+        history is a sequence of pre-rendered exchanges, oldest first.
+        """
+        remaining = self.budget_for(model_name) - self.cost(fixed_text)
+
+        if context:
+            context_budget = max(0, int(remaining * self.context_share))
+            if self.cost(context) > context_budget:
+                # ~4 characters per token, same estimate as cost()
+                context = context[:context_budget * 4] or None
+            remaining -= self.cost(context)
+
+        kept: List[str] = []
+        for exchange in reversed(history):
+            exchange_cost = self.cost(exchange)
+            if exchange_cost > remaining:
+                break
+            kept.append(exchange)
+            remaining -= exchange_cost
+        kept.reverse()
+
+        return context, kept
+
+
+# Global instance
+prompt_builder = PromptBuilder(
+    default_budget=Config.PROMPT_TOKEN_BUDGET,
+    model_budgets=Config.PROMPT_TOKEN_BUDGETS,
+    context_share=Config.PROMPT_CONTEXT_SHARE,
+)
@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` tokens per minute.
+    reserve() always succeeds and returns how long the caller must wait,
+    so concurrent callers queue up fairly instead of retrying in a burst.
+    """
+
+    def __init__(self, per_minute: float):
+        per_minute = max(1.0, per_minute)
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def try_take(self, amount: float = 1.0) -> bool:
+        """Takes amount only if it is available right now."""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self._tokens < amount:
+                return False
+            self._tokens -= amount
+            return True
+
+    def refund(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + min(amount, self.capacity))
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and fails fast for `cooldown`
+    seconds; then lets one trial call through (half-open) before closing again.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._failures < self.threshold:
+                return
+            if time.monotonic() - self._opened_at < self.cooldown or self._trial_in_flight:
+                raise CircuitOpenError("Gemini is temporarily unavailable. Please try again shortly.")
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._failures >= self.threshold
+
+
+def is_retryable(error: Exception) -> bool:
+    """Quota (429), timeouts and 5xx responses are worth retrying; everything else is not."""
+    try:
+        from google.api_core import exceptions as api_exceptions
+    except ImportError:
+        return False
+
+    return isinstance(error, (
+        api_exceptions.TooManyRequests,
+        api_exceptions.ResourceExhausted,
+        api_exceptions.ServerError,
+        api_exceptions.DeadlineExceeded,
+    ))
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """5xx responses and timeouts say upstream is unhealthy; quota and client errors do not."""
+    try:
+        from google.api_core import exceptions as api_exceptions
+    except ImportError:
+        return False
+
+    return isinstance(error, (api_exceptions.ServerError, api_exceptions.DeadlineExceeded))
+
+
+def estimate_tokens(prompt: str) -> int:
+    """Rough token count (~4 characters per token) for TPM accounting."""
+    return max(1, len(prompt) // 4)
+
+
+class GeminiGuard:
+    """
+    Shared client-side protection for every Gemini call in the process:
+    RPM/TPM token buckets, jittered exponential backoff for retryable errors,
+    and a circuit breaker that stops hammering an upstream that is down.
+
+    The limits are split into two lanes with their own buckets: interactive calls
+    (chat) and bulk calls (section-by-section summaries of long documents), which
+    get `bulk_share` of them. One long summary therefore queues behind its own
+    lane instead of using up the budget chat turns need, while chat borrows
+    whatever bulk capacity is idle once its own lane is exhausted.
+
+    An optional `limit` (a semaphore) is held only while upstream is being
+    called, never while waiting for rate-limit capacity or backing off.
+    """
+
+    def __init__(self, rpm: int, tpm: int, max_retries: int, backoff_base: float, backoff_max: float,
+                 breaker_threshold: int, breaker_cooldown: float, bulk_share: float = 0.0):
+        bulk_share = min(max(bulk_share, 0.0), 0.9)
+        self.requests = TokenBucket(rpm * (1 - bulk_share))
+        self.tokens = TokenBucket(tpm * (1 - bulk_share))
+        self.bulk_requests = TokenBucket(rpm * bulk_share) if bulk_share else self.requests
+        self.bulk_tokens = TokenBucket(tpm * bulk_share) if bulk_share else self.tokens
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    @staticmethod
+    def _take_now(requests: TokenBucket, tokens: TokenBucket, amount: int) -> bool:
+        if not requests.try_take(1):
+            return False
+        if tokens.try_take(amount):
+            return True
+        requests.refund(1)
+        return False
+
+    def _rate_limit_delay(self, prompt: str, bulk: bool = False) -> float:
+        amount = estimate_tokens(prompt)
+        if bulk:
+            return max(self.bulk_requests.reserve(1), self.bulk_tokens.reserve(amount))
+        if self.bulk_requests is not self.requests and (
+                self._take_now(self.requests, self.tokens, amount)
+                or self._take_now(self.bulk_requests, self.bulk_tokens, amount)):
+            return 0.0
+        return max(self.requests.reserve(1), self.tokens.reserve(amount))
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # "Full jitter": uniform in [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record_outcome(self, error: Exception) -> None:
+        """One breaker update per failed call; only errors that say upstream is unhealthy count."""
+        if is_upstream_failure(error):
+            self.breaker.record_failure()
+        else:
+            # Upstream answered (e.g. a bad request or quota), so it is reachable
+            self.breaker.record_success()
+
+    def call(self, fn: Callable[[], T], prompt: str, bulk: bool = False,
+             limit: Optional[threading.Semaphore] = None) -> T:
+        """Runs fn() under rate limiting, retries and the circuit breaker."""
+        # Checked once per call: retries belong to the same (possibly half-open trial) call
+        self.breaker.before_call()
+        attempt = 0
+        while True:
+            delay = self._rate_limit_delay(prompt, bulk)
+            if delay:
+                time.sleep(delay)
+            try:
+                if limit is None:
+                    result = fn()
+                else:
+                    with limit:
+                        result = fn()
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    self._record_outcome(e)
+                    raise
+                delay = self._backoff_delay(attempt)
+                logger.warning(f"Retryable Gemini error ({e}); retry {attempt + 1} in {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def call_async(self, fn: Callable[[], Awaitable[T]], prompt: str, bulk: bool = False,
+                         limit: Optional[asyncio.Semaphore] = None) -> T:
+        """Async variant of call(): waits with asyncio.sleep instead of blocking a thread."""
+        # Checked once per call: retries belong to the same (possibly half-open trial) call
+        self.breaker.before_call()
+        attempt = 0
+        while True:
+            delay = self._rate_limit_delay(prompt, bulk)
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                if limit is None:
+                    result = await fn()
+                else:
+                    async with limit:
+                        result = await fn()
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    self._record_outcome(e)
+                    raise
+                delay = self._backoff_delay(attempt)
+                logger.warning(f"Retryable Gemini error ({e}); retry {attempt + 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+
+# Global instance
+gemini_guard = GeminiGuard(
+    rpm=Config.GEMINI_RPM,
+    tpm=Config.GEMINI_TPM,
+    max_retries=Config.GEMINI_MAX_RETRIES,
+    backoff_base=Config.GEMINI_BACKOFF_BASE,
+    backoff_max=Config.GEMINI_BACKOFF_MAX,
+    breaker_threshold=Config.GEMINI_BREAKER_THRESHOLD,
+    breaker_cooldown=Config.GEMINI_BREAKER_COOLDOWN,
+    bulk_share=Config.GEMINI_BULK_SHARE,
+)
@@ -0,0 +1,80 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from config import Config
+
+CacheKey = Tuple[str, str, str, str]
+
+class ResponseCache:
+    """
+    TTL + size-bounded LRU cache for deterministic LLM tasks
+    (document analysis, summaries, notes).
+    Keys are (task, document hash, focus, model name), so a different model or
+    focus never returns a stale answer.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[CacheKey, Tuple[float, str]]" = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(task: str, document: str, focus: Optional[str], model_name: str) -> CacheKey:
+        doc_hash = hashlib.sha256(document.encode('utf-8', 'surrogatepass')).hexdigest()
+        return (task, doc_hash, focus or "", model_name)
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if time.monotonic() > expires_at:
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: CacheKey, value: str) -> None:
+        size = len(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._current_bytes += size
+
+            while self._entries and (len(self._entries) > self.max_entries or self._current_bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+
+    def _remove(self, key: CacheKey) -> None:
+        _, value = self._entries.pop(key)
+        self._current_bytes -= len(value)
+
+
+# Global instance
+response_cache = ResponseCache(
+    max_entries=Config.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=Config.RESPONSE_CACHE_MAX_BYTES,
+    ttl=Config.RESPONSE_CACHE_TTL,
+)
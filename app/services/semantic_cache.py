@@ -0,0 +1,182 @@
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import FrozenSet, Iterable, List, Optional
+
+import numpy as np
+
+from config import Config
+from app.services.document_index import tokenize
+
+# Words that flip or qualify a question's meaning; a question differing by one never matches
+_NEGATIONS = frozenset("not no never without avoid except instead stop quit".split())
+
+# Length of the shared prefix that makes two terms variants of one word (science / scientist)
+_STEM_CHARS = 5
+
+
+def _stem(term: str) -> Optional[str]:
+    return term[:_STEM_CHARS] if len(term) >= _STEM_CHARS + 1 else None
+
+
+class SemanticCache:
+    """
+    Answer cache for near-duplicate questions ("how do I become a data scientist"
+    vs "how can I become a data scientist?").
+
+    Questions are normalized (lowercase, stopwords dropped) and embedded as
+    L2-normalized hashed feature vectors (word unigrams, word bigrams and
+    character trigrams). Lookup is one matrix-vector product over a fixed-size
+    ring buffer; the best match is returned if its cosine similarity reaches
+    `threshold`, it was asked after the same conversation, it has not expired
+    and the content words the two questions do not share are all harmless.
+
+    Similarity alone is not enough: "difference between TCP and UDP" and
+    "difference between TCP and IP" are close but need different answers. A
+    differing word is harmless if the other question has a variant of it
+    (science / scientist) or if it is common among cached questions ("steps",
+    "roadmap"); at most `max_term_diff` common ones may differ, and never a
+    negation. Rare words (udp, ip, salary) are what a question is about.
+    """
+
+    def __init__(self, capacity: int, dim: int, threshold: float, ttl: float, min_tokens: int,
+                 max_term_diff: int = 2, common_fraction: float = 0.01, common_min: int = 5):
+        self.capacity = capacity
+        self.dim = dim
+        self.threshold = threshold
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.max_term_diff = max_term_diff
+        self.common_fraction = common_fraction
+        self.common_min = common_min
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._expires = np.zeros(capacity, dtype=np.float64)
+        self._answers: List[Optional[str]] = [None] * capacity
+        self._terms: List[Optional[FrozenSet[str]]] = [None] * capacity
+        self._contexts: List[int] = [0] * capacity
+        self._term_counts: Counter = Counter()  # cached questions containing each term
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def vectorize(self, text: str) -> Optional[np.ndarray]:
+        """Embeds text, or returns None if it is too short to be a self-contained question."""
+        tokens = tokenize(text)
+        if len(tokens) < self.min_tokens:
+            return None
+        return self._embed(tokens)
+
+    def _embed(self, tokens: List[str]) -> Optional[np.ndarray]:
+        features = list(tokens)
+        features.extend(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+        for token in tokens:
+            padded = f"#{token}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in features:
+            h = zlib.crc32(feature.encode('utf-8'))
+            # Signed hashing keeps collisions from only ever adding similarity
+            vector[h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    @staticmethod
+    def context_key(history: str) -> int:
+        """Fingerprint of the conversation a question was asked in (0: none)."""
+        return zlib.crc32(history.encode('utf-8')) if history else 0
+
+    def _is_common(self, term: str) -> bool:
+        count = self._term_counts.get(term, 0)
+        return count >= self.common_min and count >= self.common_fraction * self._count
+
+    def _same_question(self, terms: FrozenSet[str], cached: FrozenSet[str]) -> bool:
+        """True if every content word the two questions do not share is harmless (see class docstring)."""
+        differing = terms ^ cached
+        if not differing:
+            return True
+        if differing & _NEGATIONS:
+            return False
+        stems = ({_stem(term) for term in terms} & {_stem(term) for term in cached}) - {None}
+        unmatched = [term for term in differing if _stem(term) not in stems]
+        return (
+            len(unmatched) <= self.max_term_diff
+            and all(self._is_common(term) for term in unmatched)
+        )
+
+    def get(self, question: str, history: str = "") -> Optional[str]:
+        tokens = tokenize(question)
+        vector = self._embed(tokens) if len(tokens) >= self.min_tokens else None
+        if vector is None:
+            return None
+
+        terms = frozenset(tokens)
+        context = self.context_key(history)
+        with self._lock:
+            if self._count:
+                similarities = self._vectors[:self._count] @ vector
+                similarities[self._expires[:self._count] < time.monotonic()] = -1.0
+                candidates = np.flatnonzero(similarities >= self.threshold)
+                for slot in candidates[np.argsort(-similarities[candidates])]:
+                    if self._contexts[slot] == context and self._same_question(terms, self._terms[slot]):
+                        self.hits += 1
+                        return self._answers[slot]
+            self.misses += 1
+            return None
+
+    def put(self, question: str, answer: str, history: str = "") -> None:
+        tokens = tokenize(question)
+        vector = self._embed(tokens) if len(tokens) >= self.min_tokens else None
+        if vector is None:
+            return
+
+        terms = frozenset(tokens)
+        with self._lock:
+            slot = self._next
+            if self._terms[slot] is not None:
+                self._count_terms(self._terms[slot], -1)
+            self._vectors[slot] = vector
+            self._expires[slot] = time.monotonic() + self.ttl
+            self._answers[slot] = answer
+            self._terms[slot] = terms
+            self._contexts[slot] = self.context_key(history)
+            self._count_terms(terms, 1)
+            self._next = (slot + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def _count_terms(self, terms: Iterable[str], delta: int) -> None:
+        for term in terms:
+            self._term_counts[term] += delta
+            if self._term_counts[term] <= 0:
+                del self._term_counts[term]
+
+    def is_eligible(self, question: str, state) -> bool:
+        """
+        Answers that depend on an attached document are never shared between students.
+        Later turns are: they are cached under the conversation they were asked in.
+        """
+        return not state.documents and len(tokenize(question)) >= self.min_tokens
+
+    def clear(self) -> None:
+        with self._lock:
+            self._answers = [None] * self.capacity
+            self._terms = [None] * self.capacity
+            self._contexts = [0] * self.capacity
+            self._term_counts = Counter()
+            self._next = 0
+            self._count = 0
+
+
+# Global instance
+semantic_cache = SemanticCache(
+    capacity=Config.SEMANTIC_CACHE_SIZE,
+    dim=Config.SEMANTIC_CACHE_DIM,
+    threshold=Config.SEMANTIC_CACHE_THRESHOLD,
+    ttl=Config.SEMANTIC_CACHE_TTL,
+    min_tokens=Config.SEMANTIC_CACHE_MIN_TOKENS,
+    max_term_diff=Config.SEMANTIC_CACHE_MAX_TERM_DIFF,
+)
@@ -0,0 +1,257 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from config import Config
+from app.services.document_store import document_corpus
+from app.services.paged_pdf import PagedPDF, pdf_store
+
+logger = logging.getLogger(__name__)
+
+class SessionBackend:
+    """
+    Storage behind ChatManager's in-memory hot tier.
+    The base class keeps nothing, so sessions live only in the current process.
+    """
+
+    def load(self, user_id: str, unsaved=None):
+        """
+        Returns a ChatbotState restored from storage, or None.
+        unsaved is this worker's copy of the session; changes not yet written are kept.
+        """
+        return None
+
+    def version(self, user_id: str) -> Optional[int]:
+        """Latest stored version of a session, used to detect changes made by other workers."""
+        return None
+
+    def save(self, user_id: str, state, immediate: bool = False) -> None:
+        """Queues a session for writing (or writes it now when immediate)."""
+
+    def delete(self, user_id: str) -> None:
+        pass
+
+    def flush(self) -> None:
+        """Writes everything queued so far."""
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """
+    Sessions shared by every worker process through one SQLite database in WAL mode.
+
+    * Session rows hold the small fields, history and document ids as JSON.
+      Document text lives once per unique document in a separate table and is
+      only read when a session first touches it.
+    * save() only marks a session dirty. A writer thread flushes dirty sessions
+      in one transaction every `flush_interval` seconds (or sooner once
+      `flush_batch` are pending), so a burst of chat turns costs one commit.
+      Uploads and workspace changes are written immediately instead.
+    * Writes are compare-and-set on the version a session was loaded at. If another
+      worker wrote in between, both copies are merged (see ChatbotState.merge_records)
+      and the in-memory session reloads the merged record on its next use.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS sessions ("
+        " user_id TEXT PRIMARY KEY, version INTEGER NOT NULL, data TEXT NOT NULL, updated_at REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS documents ("
+        " doc_id TEXT PRIMARY KEY, text TEXT NOT NULL, updated_at REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)",
+        "CREATE INDEX IF NOT EXISTS documents_updated_at ON documents (updated_at)",
+    )
+
+    def __init__(self, path: str, flush_interval: float, flush_batch: int, retention: float):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.retention = retention
+        self._local = threading.local()
+        self._pending: Dict[str, object] = {}
+        self._pending_lock = threading.Condition()
+
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+        threading.Thread(target=self._writer_loop, name="session-writer", daemon=True).start()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections cannot be shared between threads; keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, user_id: str, unsaved=None):
+        from app.services.chat_manager import ChatbotState
+
+        row = self._connection().execute(
+            "SELECT data, version FROM sessions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        record = json.loads(row[0])
+        if unsaved is not None:
+            with self._pending_lock:
+                dirty = user_id in self._pending
+            if dirty:
+                merged = ChatbotState.merge_records(record, unsaved.to_record(), unsaved.base)
+                state = ChatbotState.from_record(merged, row[1], document_loader=self._reference_document)
+                state.base = ChatbotState.record_base(record)
+                return state
+        return ChatbotState.from_record(record, row[1], document_loader=self._reference_document)
+
+    def _reference_document(self, doc_id: str):
+        """
+        Shared corpus document for doc_id; the text is read from the database on first use,
+        or page by page when the PDF itself is still in the shared PDF store.
+        """
+        path = pdf_store.find(doc_id)
+        pages = PagedPDF(doc_id, path) if path else None
+        return document_corpus.reference(doc_id, lambda: self._load_document(doc_id), pages=pages)
+
+    def _load_document(self, doc_id: str) -> Optional[str]:
+        row = self._connection().execute("SELECT text FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        return row[0] if row else None
+
+    def version(self, user_id: str) -> Optional[int]:
+        row = self._connection().execute("SELECT version FROM sessions WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def save(self, user_id: str, state, immediate: bool = False) -> None:
+        with self._pending_lock:
+            if immediate:
+                self._pending.pop(user_id, None)
+            else:
+                self._pending[user_id] = state
+                if len(self._pending) >= self.flush_batch:
+                    self._pending_lock.notify()
+        if immediate:
+            self._write({user_id: state})
+
+    def delete(self, user_id: str) -> None:
+        with self._pending_lock:
+            self._pending.pop(user_id, None)
+        with self._connection() as conn:
+            conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+            # Shared documents are left for purge_expired, other sessions may reference them
+
+    def flush(self) -> None:
+        with self._pending_lock:
+            batch, self._pending = self._pending, {}
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch: Dict[str, object]) -> None:
+        from app.services.chat_manager import ChatbotState
+
+        now = time.time()
+        rows = []
+        new_documents: Dict[str, object] = {}
+        referenced = set()
+        for user_id, state in batch.items():
+            try:
+                rows.append((user_id, state, state.version, state.base, state.to_record()))
+                for ref in list(state.documents.values()):
+                    document = ref.document
+                    referenced.add(document.doc_id)
+                    if not document.persisted:
+                        new_documents[document.doc_id] = document
+            except RuntimeError:
+                # History changed while serializing; retry on the next flush
+                self.save(user_id, state)
+
+        # Each unique document is written once, however many sessions reference it.
+        # Paged documents are stored by reference only (their PDF is in the PDF store).
+        documents = []
+        for doc_id, document in new_documents.items():
+            text = document.read_text()
+            if text is not None:
+                documents.append((doc_id, text, now))
+
+        written = []  # (state, version it was based on, version now stored, record stored)
+        try:
+            with self._connection() as conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO documents (doc_id, text, updated_at) VALUES (?, ?, ?)", documents
+                )
+                for user_id, state, base_version, base, record in rows:
+                    # Compare-and-set: only replace the version this copy was loaded at
+                    cursor = conn.execute(
+                        "INSERT INTO sessions (user_id, version, data, updated_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(user_id) DO UPDATE SET version = excluded.version, data = excluded.data, "
+                        "updated_at = excluded.updated_at WHERE sessions.version = ?",
+                        (user_id, base_version + 1, json.dumps(record), now, base_version),
+                    )
+                    if cursor.rowcount:
+                        written.append((state, base_version, base_version + 1, record))
+                        continue
+
+                    # Another worker wrote since; the write lock is held, so merge and store on top of it
+                    stored_data, stored_version = conn.execute(
+                        "SELECT data, version FROM sessions WHERE user_id = ?", (user_id,)
+                    ).fetchone()
+                    merged = ChatbotState.merge_records(json.loads(stored_data), record, base)
+                    conn.execute(
+                        "UPDATE sessions SET version = ?, data = ?, updated_at = ? WHERE user_id = ?",
+                        (stored_version + 1, json.dumps(merged), now, user_id),
+                    )
+                    logger.info(f"Merged concurrent changes to session {user_id} (v{stored_version + 1})")
+                # Keeps documents that are still in use from being purged
+                conn.executemany(
+                    "UPDATE documents SET updated_at = ? WHERE doc_id = ?", [(now, doc_id) for doc_id in referenced]
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Could not persist {len(rows)} sessions: {e}")
+            return
+
+        for state, base_version, version, record in written:
+            # A merged session keeps its old version, so its next use reloads the merged record
+            if state.version == base_version:
+                state.version = version
+                state.base = ChatbotState.record_base(record)
+
+        for doc_id, document in new_documents.items():
+            document.persisted = True
+            # Now reloadable from the database, so the corpus may unload it under memory pressure
+            document.set_loader(lambda doc_id=doc_id: self._load_document(doc_id))
+
+    def purge_expired(self) -> None:
+        cutoff = time.time() - self.retention
+        with self._connection() as conn:
+            conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+            conn.execute("DELETE FROM documents WHERE updated_at < ?", (cutoff,))
+
+    def _writer_loop(self) -> None:
+        last_purge = time.monotonic()
+        while True:
+            with self._pending_lock:
+                self._pending_lock.wait(timeout=self.flush_interval)
+            try:
+                self.flush()
+                if time.monotonic() - last_purge > 3600:
+                    self.purge_expired()
+                    last_purge = time.monotonic()
+            except Exception as e:
+                logger.error(f"Session writer error: {e}")
+
+
+def create_session_backend() -> SessionBackend:
+    """Builds the backend selected by Config.SESSION_BACKEND ('memory' or 'sqlite')."""
+    if Config.SESSION_BACKEND == 'sqlite':
+        os.makedirs(os.path.dirname(Config.SESSION_DB_PATH), exist_ok=True)
+        return SQLiteSessionBackend(
+            Config.SESSION_DB_PATH,
+            flush_interval=Config.SESSION_FLUSH_INTERVAL,
+            flush_batch=Config.SESSION_FLUSH_BATCH,
+            retention=Config.SESSION_DB_RETENTION,
+        )
+    return SessionBackend()
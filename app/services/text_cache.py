@@ -0,0 +1,167 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class PDFTextCache:
+    """
+    Content-addressed cache for extracted PDF text.
+    Entries are keyed by the SHA-256 of the raw PDF bytes, so the same file
+    uploaded twice (by anyone) is only parsed once.
+
+    Two layers:
+    * an in-memory LRU bounded by the total size of the cached text
+    * an optional on-disk layer of UTF-8 text files that survives restarts,
+      bounded by disk_max_bytes (least recently used files are deleted first)
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None, disk_max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.disk_dir and not os.path.exists(self.disk_dir):
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def key_for(pdf_bytes: bytes) -> str:
+        """Returns the content hash used as the cache key."""
+        return hashlib.sha256(pdf_bytes).hexdigest()
+
+    @staticmethod
+    def _size_of(text: str) -> int:
+        return len(text.encode('utf-8'))
+
+    def get(self, key: str) -> Optional[str]:
+        """Looks up text in memory first, then on disk (promoting disk hits)."""
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return text
+
+        text = self._read_disk(key)
+        if text is not None:
+            self._put_memory(key, text)
+            with self._lock:
+                self.hits += 1
+            return text
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def __contains__(self, key: str) -> bool:
+        """Whether key is cached in either layer (not counted as a lookup)."""
+        with self._lock:
+            if key in self._entries:
+                return True
+        path = self._disk_path(key)
+        return bool(path) and os.path.exists(path)
+
+    def put(self, key: str, text: str) -> None:
+        """Stores text in both layers."""
+        self._put_memory(key, text)
+        self._write_disk(key, text)
+
+    def clear(self) -> None:
+        """Drops the in-memory layer (disk files are left in place)."""
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+
+    def _put_memory(self, key: str, text: str) -> None:
+        size = self._size_of(text)
+        if size > self.max_bytes:
+            # Never let one huge document flush the whole cache
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._current_bytes -= self._size_of(self._entries.pop(key))
+            self._entries[key] = text
+            self._current_bytes += size
+
+            while self._current_bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._current_bytes -= self._size_of(evicted)
+
+    def _disk_path(self, key: str) -> Optional[str]:
+        if not self.disk_dir:
+            return None
+        return os.path.join(self.disk_dir, f"{key}.txt")
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        path = self._disk_path(key)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            os.utime(path)  # mtime is the LRU order for disk pruning
+            return text
+        except OSError as e:
+            logger.error(f"Could not read cached PDF text {path}: {e}")
+            return None
+
+    def _write_disk(self, key: str, text: str) -> None:
+        path = self._disk_path(key)
+        if not path:
+            return
+        # Write to a temp file and rename so readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Could not write cached PDF text {path}: {e}")
+            return
+        self._enforce_disk_limit(keep=path)
+
+    def _enforce_disk_limit(self, keep: str) -> None:
+        """Deletes the least recently used text files until the disk layer fits disk_max_bytes."""
+        if self.disk_max_bytes is None:
+            return
+        try:
+            entries = []
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.txt'):
+                    full_path = os.path.join(self.disk_dir, name)
+                    stat = os.stat(full_path)
+                    entries.append((stat.st_mtime, stat.st_size, full_path))
+        except OSError as e:
+            logger.warning(f"Could not scan text cache folder: {e}")
+            return
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, full_path in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            if full_path == keep:
+                continue
+            try:
+                os.remove(full_path)
+            except OSError:
+                continue
+            total -= size
+
+
+# Global instance
+pdf_text_cache = PDFTextCache(
+    max_bytes=Config.PDF_TEXT_CACHE_MAX_BYTES,
+    disk_dir=Config.PDF_TEXT_CACHE_FOLDER if Config.PDF_TEXT_CACHE_DISK else None,
+    disk_max_bytes=Config.PDF_TEXT_CACHE_DISK_MAX_BYTES,
+)
@@ -0,0 +1,38 @@
+"""Synthetic PDF corpus of varying page counts for upload benchmarks."""
+import io
+import random
+from functools import lru_cache
+from typing import Dict, Iterable
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate
+
+DEFAULT_PAGE_COUNTS = (1, 10, 50, 300)
+
+_VOCABULARY = (
+    "algorithm matrix eigenvalue theorem proof lemma gradient entropy protocol compiler "
+    "semester syllabus lecture assignment credit internship resume project database kernel "
+    "network latency throughput variance regression classifier neuron calculus integral"
+).split()
+
+
+@lru_cache(maxsize=None)
+def make_pdf(pages: int, words_per_page: int = 350, seed: int = 0) -> bytes:
+    """Builds a text-heavy PDF with `pages` pages (deterministic for a given seed)."""
+    rng = random.Random(seed * 100003 + pages)
+    styles = getSampleStyleSheet()
+    story = []
+    for page in range(pages):
+        story.append(Paragraph(f"Chapter {page + 1}", styles['Heading2']))
+        words = " ".join(rng.choice(_VOCABULARY) for _ in range(words_per_page))
+        story.append(Paragraph(words, styles['Normal']))
+        story.append(PageBreak())
+
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, pagesize=letter).build(story)
+    return buffer.getvalue()
+
+
+def build_corpus(page_counts: Iterable[int] = DEFAULT_PAGE_COUNTS) -> Dict[int, bytes]:
+    return {pages: make_pdf(pages) for pages in page_counts}
@@ -0,0 +1,324 @@
+"""
+End-to-end load benchmark.
+
+Serves the Flask app on a local threaded WSGI server, replaces Gemini with the
+configurable stand-in from benchmarks.fake_backend and drives /chat,
+/chat/stream and /upload from concurrent HTTP clients. Uploads come from a
+synthetic PDF corpus of varying page counts. Reports p50/p95/p99 latency,
+throughput and process RSS per endpoint.
+
+    python -m benchmarks.e2e --clients 16 --duration 30 --latency 0.8 --error-rate 0.02
+    python -m benchmarks.e2e --mix chat=1 --latency 0.2          # chat only
+
+Each client connects from its own loopback address (127.0.0.N, Linux) so it
+gets its own session, as separate users would.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Measure the app, not the client-side rate limiter or answer reuse
+os.environ.setdefault('GEMINI_RPM', '1000000')
+os.environ.setdefault('GEMINI_TPM', '1000000000')
+os.environ.setdefault('SEMANTIC_CACHE_MIN_TOKENS', '1000000')
+
+from werkzeug.serving import make_server  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.services.text_cache import pdf_text_cache  # noqa: E402
+from app.services.response_cache import response_cache  # noqa: E402
+from app.services.chat_manager import chat_manager  # noqa: E402
+from benchmarks.corpus import build_corpus  # noqa: E402
+from benchmarks.fake_backend import FakeGeminiModel, install  # noqa: E402
+
+QUESTIONS = (
+    "How should I prepare for my data structures exam next week",
+    "What projects would strengthen a machine learning internship application",
+    "Can you explain the key ideas of chapter {n} in simple terms",
+    "How do I balance a part time job with {n} credits this semester",
+    "What should I focus on in the document I uploaded about topic {n}",
+)
+
+
+def _rss_bytes() -> int:
+    """Current resident set size (falls back to the peak where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return _peak_rss_bytes()
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def _parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ('chat', 'stream', 'upload'):
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _loopback_source(client_id: int) -> Optional[tuple]:
+    """A distinct 127.0.0.N source address per client, if the OS routes all of 127/8."""
+    if not sys.platform.startswith('linux'):
+        return None
+    return (f"127.0.{(client_id + 2) // 250}.{(client_id + 2) % 250 + 2}", 0)
+
+
+class Recorder:
+    """Thread-safe latency samples per endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.first_byte: Dict[str, List[float]] = defaultdict(list)
+        self.failures: Dict[str, int] = defaultdict(int)
+        self.error_replies: Dict[str, int] = defaultdict(int)
+
+    def add(self, endpoint: str, seconds: float, ok: bool, error_reply: bool = False,
+            first_byte: Optional[float] = None) -> None:
+        with self._lock:
+            if not ok:
+                self.failures[endpoint] += 1
+                return
+            self.latencies[endpoint].append(seconds)
+            if error_reply:
+                self.error_replies[endpoint] += 1
+            if first_byte is not None:
+                self.first_byte[endpoint].append(first_byte)
+
+
+class Client:
+    """One simulated user with a keep-alive HTTP connection."""
+
+    def __init__(self, client_id: int, port: int, corpus: Dict[int, bytes], recorder: Recorder,
+                 source: Optional[tuple] = None):
+        self.client_id = client_id
+        self.port = port
+        self.corpus = corpus
+        self.recorder = recorder
+        self.source = source
+        self.conn = None
+        self.turn = 0
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120, source_address=self.source)
+        return self.conn
+
+    def _request(self, path: str, body: bytes, content_type: str) -> http.client.HTTPResponse:
+        conn = self._connect()
+        try:
+            conn.request('POST', path, body=body, headers={'Content-Type': content_type})
+            return conn.getresponse()
+        except (ConnectionError, http.client.HTTPException, OSError):
+            # Server closed the keep-alive connection; retry once on a fresh one
+            conn.close()
+            self.conn = None
+            conn = self._connect()
+            conn.request('POST', path, body=body, headers={'Content-Type': content_type})
+            return conn.getresponse()
+
+    def _message(self) -> str:
+        self.turn += 1
+        question = random.choice(QUESTIONS).format(n=random.randint(1, 40))
+        # Unique per turn so repeated questions don't all come from the response caches
+        return f"{question} (client {self.client_id} turn {self.turn})"
+
+    def chat(self) -> None:
+        body = json.dumps({'message': self._message()}).encode()
+        started = time.perf_counter()
+        try:
+            resp = self._request('/chat', body, 'application/json')
+            payload = json.loads(resp.read())
+            ok = resp.status == 200
+            reply = payload.get('reply', '')
+        except Exception:
+            ok, reply = False, ''
+        self.recorder.add('chat', time.perf_counter() - started, ok, error_reply=reply.startswith("⚠️"))
+
+    def stream(self) -> None:
+        body = json.dumps({'message': self._message()}).encode()
+        started = time.perf_counter()
+        first_byte = None
+        reply = ''
+        try:
+            resp = self._request('/chat/stream', body, 'application/json')
+            ok = resp.status == 200
+            for line in resp:
+                if first_byte is None and line.startswith(b'data:'):
+                    first_byte = time.perf_counter() - started
+                if line.startswith(b'event: done'):
+                    done = json.loads(next(resp)[len(b'data:'):])
+                    reply = done.get('reply', '')
+            resp.read()
+        except Exception:
+            ok = False
+        self.recorder.add('stream', time.perf_counter() - started, ok,
+                          error_reply=reply.startswith("⚠️"), first_byte=first_byte)
+
+    def upload(self) -> None:
+        pages = random.choice(list(self.corpus))
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\n"
+            f"Content-Disposition: form-data; name=\"file\"; filename=\"notes_{pages}p.pdf\"\r\n"
+            f"Content-Type: application/pdf\r\n\r\n"
+        ).encode() + self.corpus[pages] + f"\r\n--{boundary}--\r\n".encode()
+        endpoint = f"upload[{pages}p]"
+        started = time.perf_counter()
+        try:
+            resp = self._request('/upload', body, f'multipart/form-data; boundary={boundary}')
+            resp.read()
+            ok = resp.status == 200
+        except Exception:
+            ok = False
+        self.recorder.add(endpoint, time.perf_counter() - started, ok)
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+
+
+def _check_loopback_sources(port: int, clients: int) -> bool:
+    """True if the per-client source addresses are usable on this machine."""
+    source = _loopback_source(clients - 1)
+    if source is None:
+        return False
+    try:
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5, source_address=source)
+        conn.request('GET', '/')
+        conn.getresponse().read()
+        conn.close()
+        return True
+    except OSError:
+        return False
+
+
+def _print_report(recorder: Recorder, elapsed: float, rss_start: int, rss_samples: List[int], model) -> None:
+    mb = 1024 * 1024
+    header = f"{'endpoint':<16}{'ok':>7}{'fail':>6}{'err':>6}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+    print(header)
+    print("-" * len(header))
+    total = 0
+    for endpoint in sorted(set(recorder.latencies) | set(recorder.failures)):
+        samples = recorder.latencies[endpoint]
+        total += len(samples)
+        print(
+            f"{endpoint:<16}{len(samples):>7}{recorder.failures[endpoint]:>6}{recorder.error_replies[endpoint]:>6}"
+            f"{len(samples) / elapsed:>8.1f}"
+            f"{_percentile(samples, 50) * 1000:>9.0f}{_percentile(samples, 95) * 1000:>9.0f}"
+            f"{_percentile(samples, 99) * 1000:>9.0f}{(max(samples) if samples else 0) * 1000:>9.0f}"
+        )
+    for endpoint, samples in sorted(recorder.first_byte.items()):
+        print(f"{endpoint + ' ttfb':<16}{len(samples):>7}{'':>20}"
+              f"{_percentile(samples, 50) * 1000:>9.0f}{_percentile(samples, 95) * 1000:>9.0f}"
+              f"{_percentile(samples, 99) * 1000:>9.0f}{max(samples) * 1000:>9.0f}")
+
+    print()
+    print(f"throughput: {total / elapsed:.1f} req/s ({total} requests in {elapsed:.1f}s)")
+    print(f"rss: start {rss_start / mb:.0f} MB, end {rss_samples[-1] / mb:.0f} MB, "
+          f"sampled max {max(rss_samples) / mb:.0f} MB, process peak {_peak_rss_bytes() / mb:.0f} MB")
+    print(f"fake gemini calls: {model.calls}; pdf text cache hits/misses: "
+          f"{pdf_text_cache.hits}/{pdf_text_cache.misses}; response cache hits/misses: "
+          f"{response_cache.hits}/{response_cache.misses}")
+    print(f"sessions: {chat_manager.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=16, help="concurrent simulated users")
+    parser.add_argument('--duration', type=float, default=20.0, help="seconds to run")
+    parser.add_argument('--mix', type=_parse_mix, default=_parse_mix('chat=6,stream=3,upload=1'),
+                        help="endpoint weights, e.g. chat=6,stream=3,upload=1")
+    parser.add_argument('--pages', default='1,10,50,300', help="page counts of the synthetic PDF corpus")
+    parser.add_argument('--latency', type=float, default=0.5, help="mean fake Gemini latency (s)")
+    parser.add_argument('--jitter', type=float, default=0.3, help="latency jitter as a fraction of the mean")
+    parser.add_argument('--stream-chunks', type=int, default=8)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of fake Gemini calls that fail with 503")
+    parser.add_argument('--reply-chars', type=int, default=1500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    print("building corpus...", end=" ", flush=True)
+    corpus = build_corpus(int(p) for p in args.pages.split(','))
+    print(", ".join(f"{pages}p={len(data) // 1024}KB" for pages, data in corpus.items()))
+
+    model = install(FakeGeminiModel(latency=args.latency, jitter=args.jitter, stream_chunks=args.stream_chunks,
+                                    error_rate=args.error_rate, reply_chars=args.reply_chars))
+    app = create_app()
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # One access-log line per request skews timings
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    per_client_sources = _check_loopback_sources(port, args.clients)
+    if not per_client_sources:
+        print("note: per-client loopback addresses unavailable; all clients share one session")
+
+    recorder = Recorder()
+    endpoints = list(args.mix)
+    weights = [args.mix[name] for name in endpoints]
+    stop = threading.Event()
+    rss_start = _rss_bytes()
+    rss_samples = [rss_start]
+
+    def sample_rss():
+        while not stop.wait(0.25):
+            rss_samples.append(_rss_bytes())
+
+    def run_client(client_id):
+        source = _loopback_source(client_id) if per_client_sources else None
+        client = Client(client_id, port, corpus, recorder, source)
+        try:
+            while not stop.is_set():
+                getattr(client, random.choices(endpoints, weights)[0])()
+        finally:
+            client.close()
+
+    threading.Thread(target=sample_rss, daemon=True).start()
+    started = time.perf_counter()
+    clients = [threading.Thread(target=run_client, args=(i,)) for i in range(args.clients)]
+    for t in clients:
+        t.start()
+    time.sleep(args.duration)
+    stop.set()
+    for t in clients:
+        t.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    print(f"\n{args.clients} clients, {args.duration:.0f}s, fake latency {args.latency}s "
+          f"+/-{args.jitter:.0%}, error rate {args.error_rate:.0%}\n")
+    _print_report(recorder, elapsed, rss_start, rss_samples, model)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Local stand-in for the Gemini API, for benchmarks.
+
+install() swaps the models used by GeminiService and LLMService (through the
+model registry) for FakeGeminiModel, so no API key or quota is needed.
+"""
+import asyncio
+import random
+import time
+
+from google.api_core import exceptions as api_exceptions
+
+from app.services.gemini_service import GeminiService
+from app.services.model_registry import model_registry
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """
+    Mimics GenerativeModel.generate_content / generate_content_async.
+
+    latency:      mean seconds per call (uniformly jittered by +/- `jitter` fraction)
+    stream_chunks: number of chunks a streamed reply is split into
+    error_rate:   probability of raising a retryable 503, like an overloaded upstream
+    reply_chars:  size of each reply
+    """
+
+    model_name = 'models/fake-gemini'
+
+    def __init__(self, latency=0.5, jitter=0.3, stream_chunks=8, error_rate=0.0, reply_chars=1500):
+        self.latency = latency
+        self.jitter = jitter
+        self.stream_chunks = max(1, stream_chunks)
+        self.error_rate = error_rate
+        self.reply_chars = reply_chars
+        self.calls = 0
+
+    def _delay(self):
+        return max(0.0, self.latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def _reply(self, prompt):
+        self.calls += 1
+        if random.random() < self.error_rate:
+            raise api_exceptions.ServiceUnavailable("fake upstream overloaded")
+        seed = f"Reply to a {len(prompt)}-char prompt. "
+        return (seed * (self.reply_chars // len(seed) + 1))[:self.reply_chars]
+
+    def _stream(self, text):
+        # The first chunk arrives after a fraction of the latency, like a real stream
+        step = max(1, len(text) // self.stream_chunks)
+        total = self._delay()
+        for i in range(0, len(text), step):
+            time.sleep(total / self.stream_chunks)
+            yield _Chunk(text[i:i + step])
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        text = self._reply(prompt)
+        if stream:
+            return self._stream(text)
+        time.sleep(self._delay())
+        return _Chunk(text)
+
+    async def _stream_async(self, text):
+        step = max(1, len(text) // self.stream_chunks)
+        total = self._delay()
+        for i in range(0, len(text), step):
+            await asyncio.sleep(total / self.stream_chunks)
+            yield _Chunk(text[i:i + step])
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        text = self._reply(prompt)
+        if stream:
+            return self._stream_async(text)
+        await asyncio.sleep(self._delay())
+        return _Chunk(text)
+
+
+def install(model: FakeGeminiModel) -> FakeGeminiModel:
+    """Routes every Gemini call in this process to model."""
+    GeminiService._model = model
+    model_registry.get = lambda model_name: model
+    model_registry.ensure_configured = lambda: True
+    return model
@@ -0,0 +1,131 @@
+"""
+Concurrency stress check for ChatManager.
+
+Hammers /chat, /chat/stream and /upload from many threads against a handful of
+sessions (so turns from the same user overlap), using a stand-in Gemini model
+with random latency. Afterwards every session must contain exactly the turns
+that were sent, each intact and in a consistent state.
+
+    python -m benchmarks.session_concurrency --threads 32 --users 4 --turns 5
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Measure locking, not the client-side rate limiter or answer reuse
+os.environ.setdefault('GEMINI_RPM', '1000000')
+os.environ.setdefault('SEMANTIC_CACHE_MIN_TOKENS', '1000000')
+
+from app import create_app  # noqa: E402
+from app.services.chat_manager import ChatbotState, chat_manager  # noqa: E402
+from app.services.gemini_service import GeminiService  # noqa: E402
+
+
+class _Reply:
+    def __init__(self, text):
+        self.text = text
+
+
+class SlowFakeModel:
+    """Echoes the student's message after a random delay."""
+
+    model_name = 'models/stress-fake'
+
+    @staticmethod
+    def _echo(prompt):
+        return prompt.rsplit("Student: ", 1)[-1].split("\n", 1)[0]
+
+    def generate_content(self, prompt, stream=False):
+        time.sleep(random.uniform(0, 0.01))
+        if stream:
+            return [_Reply("echo:"), _Reply(self._echo(prompt))]
+        return _Reply("echo:" + self._echo(prompt))
+
+    async def generate_content_async(self, prompt, stream=False):
+        import asyncio
+        await asyncio.sleep(random.uniform(0, 0.01))
+        if stream:
+            return self._stream_async([_Reply("echo:"), _Reply(self._echo(prompt))])
+        return _Reply("echo:" + self._echo(prompt))
+
+    @staticmethod
+    async def _stream_async(chunks):
+        for chunk in chunks:
+            yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--users', type=int, default=4)
+    parser.add_argument('--turns', type=int, default=5, help="turns per thread")
+    args = parser.parse_args()
+
+    GeminiService._model = SlowFakeModel()
+    app = create_app()
+    sent = Counter()
+    sent_lock = threading.Lock()
+    errors = []
+
+    def worker(worker_id):
+        client = app.test_client()
+        for turn in range(args.turns):
+            user = f"10.0.0.{random.randrange(args.users)}"
+            message = f"worker {worker_id} turn {turn} unique question"
+            try:
+                kind = random.random()
+                if kind < 0.1:
+                    resp = client.post('/upload', environ_base={'REMOTE_ADDR': user},
+                                       data={'file': (io.BytesIO(b"%PDF-1.4 not really"), f"w{worker_id}.pdf")},
+                                       content_type='multipart/form-data')
+                elif kind < 0.4:
+                    resp = client.post('/chat/stream', json={'message': message}, environ_base={'REMOTE_ADDR': user})
+                    resp.get_data()  # Drain the stream so the turn completes
+                else:
+                    resp = client.post('/chat', json={'message': message}, environ_base={'REMOTE_ADDR': user})
+                if resp.status_code != 200:
+                    errors.append(f"{user}: HTTP {resp.status_code}")
+                    continue
+                with sent_lock:
+                    sent[user] += 1
+            except Exception as e:
+                errors.append(f"{user}: {e!r}")
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    for user, count in sorted(sent.items()):
+        state = chat_manager.get_state(user)
+        history = list(state.conversation_history)
+        expected = min(count, ChatbotState.max_history_length)
+        if len(history) != expected:
+            errors.append(f"{user}: {len(history)} history entries, expected {expected}")
+        for entry in history:
+            question = entry.user_message
+            if not question.startswith("upload ") and entry.bot_response != "echo:" + question:
+                errors.append(f"{user}: reply {entry.bot_response!r} does not belong to {question!r}")
+
+    total = sum(sent.values())
+    print(f"{total} turns from {args.threads} threads over {args.users} sessions in {elapsed:.2f}s")
+    if errors:
+        print(f"FAILED with {len(errors)} problems:")
+        for error in errors[:20]:
+            print("  " + error)
+        sys.exit(1)
+    print("OK: every session history is complete and consistent")
+
+
+if __name__ == '__main__':
+    main()
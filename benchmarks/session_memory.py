@@ -0,0 +1,82 @@
+"""
+Per-session memory benchmark for ChatbotState.
+
+Compares the slotted, ring-buffered ChatbotState against the previous layout
+(a __dict__ object holding a list of dicts with ISO timestamp strings).
+
+    python -m benchmarks.session_memory --sessions 10000 --exchanges 20
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.chat_manager import ChatbotState  # noqa: E402
+
+
+class LegacyChatbotState:
+    """The pre-slots layout, kept here only as a baseline."""
+
+    def __init__(self):
+        self.conversation_history = []
+        self.last_domain = None
+        self.last_llm_topic = None
+        self.user_interest_field = None
+        self.loaded_file_path = None
+        self.loaded_file_type = None
+        self.pdf_text = None
+        self.project_suggested_once = False
+        self.resume_outline_pending = False
+        self.max_history_length = 20
+        self.last_career_domain = None
+
+    def add_to_history(self, user_message, bot_response):
+        self.conversation_history.append({
+            'timestamp': datetime.now().isoformat(),
+            'user_message': user_message,
+            'bot_response': bot_response,
+        })
+        if len(self.conversation_history) > self.max_history_length:
+            self.conversation_history = self.conversation_history[-self.max_history_length:]
+
+
+def measure(state_cls, sessions: int, exchanges: int, message_chars: int) -> float:
+    """Returns the average traced bytes per session."""
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+
+    states = []
+    for i in range(sessions):
+        state = state_cls()
+        for j in range(exchanges):
+            # Unique strings per session, as with real traffic
+            state.add_to_history(f"q{i}-{j} " + "x" * message_chars, f"a{i}-{j} " + "y" * message_chars * 4)
+        states.append(state)
+
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (after - before) / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=5000)
+    parser.add_argument('--exchanges', type=int, default=20)
+    parser.add_argument('--message-chars', type=int, default=60)
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions x {args.exchanges} exchanges ({args.message_chars}-char questions)")
+    for label, state_cls in (("empty legacy", LegacyChatbotState), ("empty slotted", ChatbotState)):
+        print(f"  {label:<16} {measure(state_cls, args.sessions, 0, 0):>10,.0f} bytes/session")
+    for label, state_cls in (("legacy", LegacyChatbotState), ("slotted", ChatbotState)):
+        per_session = measure(state_cls, args.sessions, args.exchanges, args.message_chars)
+        print(f"  {label:<16} {per_session:>10,.0f} bytes/session")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,108 @@ class Config:
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
     UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max limit
+
+    # Extracted PDF text cache (keyed by SHA-256 of the uploaded bytes)
+    PDF_TEXT_CACHE_MAX_BYTES = int(os.environ.get('PDF_TEXT_CACHE_MAX_BYTES', 64 * 1024 * 1024))  # 64MB in memory
+    PDF_TEXT_CACHE_DISK = os.environ.get('PDF_TEXT_CACHE_DISK', '1') == '1'
+    PDF_TEXT_CACHE_FOLDER = os.path.join(UPLOAD_FOLDER, 'text_cache')
+    PDF_TEXT_CACHE_DISK_MAX_BYTES = int(os.environ.get('PDF_TEXT_CACHE_DISK_MAX_BYTES', 1024 * 1024 * 1024))  # 1GB on disk
+
+    # Parallel page extraction (process pool) for large PDFs
+    PDF_EXTRACT_WORKERS = int(os.environ.get('PDF_EXTRACT_WORKERS', min(4, os.cpu_count() or 1)))
+    PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', 50))
+
+    # Spool uploads to disk and parse them memory-mapped instead of reading them into memory
+    UPLOAD_SPOOL = os.environ.get('UPLOAD_SPOOL', '1') == '1'
+    UPLOAD_SPOOL_FOLDER = os.path.join(UPLOAD_FOLDER, 'spool')
+
+    # Spooled PDFs are kept (content-addressed) and read page by page on demand
+    PDF_STORE_FOLDER = os.path.join(UPLOAD_FOLDER, 'documents')
+    PDF_STORE_MAX_BYTES = int(os.environ.get('PDF_STORE_MAX_BYTES', 2 * 1024 * 1024 * 1024))  # 2GB on disk
+    PAGE_CACHE_MAX_BYTES = int(os.environ.get('PAGE_CACHE_MAX_BYTES', 64 * 1024 * 1024))  # 64MB of page text
+    SUMMARY_MAP_CHARS = int(os.environ.get('SUMMARY_MAP_CHARS', 20000))  # document text per summary/notes prompt
+    SUMMARY_CONCURRENCY = int(os.environ.get('SUMMARY_CONCURRENCY', 8))  # section prompts in flight per summary
+
+    # Rendered summary PDFs (process pool, content-addressed, LRU-bounded folder)
+    PDF_EXPORT_FOLDER = os.path.join(UPLOAD_FOLDER, 'exports')
+    PDF_EXPORT_MAX_BYTES = int(os.environ.get('PDF_EXPORT_MAX_BYTES', 256 * 1024 * 1024))  # 256MB on disk
+    PDF_EXPORT_MAX_FILES = int(os.environ.get('PDF_EXPORT_MAX_FILES', 1000))
+    PDF_EXPORT_WORKERS = int(os.environ.get('PDF_EXPORT_WORKERS', 2))
+    PDF_EXPORT_TIMEOUT = int(os.environ.get('PDF_EXPORT_TIMEOUT', 120))  # seconds a blocking export waits
+
+    # Chat session store limits (LRU eviction + idle expiry)
+    SESSION_MAX_ENTRIES = int(os.environ.get('SESSION_MAX_ENTRIES', 10000))
+    SESSION_MAX_BYTES = int(os.environ.get('SESSION_MAX_BYTES', 256 * 1024 * 1024))  # 256MB
+    SESSION_IDLE_TTL = int(os.environ.get('SESSION_IDLE_TTL', 60 * 60))  # seconds
+
+    # Multi-document workspaces: documents are shared across sessions and stored once
+    SESSION_MAX_DOCUMENTS = int(os.environ.get('SESSION_MAX_DOCUMENTS', 20))
+    DOCUMENT_CORPUS_MAX_BYTES = int(os.environ.get('DOCUMENT_CORPUS_MAX_BYTES', 512 * 1024 * 1024))  # resident text + indexes
+
+    # Session persistence shared across worker processes ('memory' or 'sqlite')
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'memory')
+    SESSION_DB_PATH = os.environ.get('SESSION_DB_PATH', os.path.join(UPLOAD_FOLDER, 'sessions.db'))
+    SESSION_FLUSH_INTERVAL = float(os.environ.get('SESSION_FLUSH_INTERVAL', 0.5))  # seconds
+    SESSION_FLUSH_BATCH = int(os.environ.get('SESSION_FLUSH_BATCH', 100))
+    SESSION_DB_RETENTION = int(os.environ.get('SESSION_DB_RETENTION', 7 * 24 * 60 * 60))  # seconds
+
+    # Cache for deterministic document tasks (analysis, summary, notes)
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1000))
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))  # 32MB
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 24 * 60 * 60))  # seconds
+
+    # Retrieval over uploaded documents (BM25 over chunks)
+    RETRIEVAL_CHUNK_CHARS = int(os.environ.get('RETRIEVAL_CHUNK_CHARS', 800))
+    RETRIEVAL_CONTEXT_CHARS = int(os.environ.get('RETRIEVAL_CONTEXT_CHARS', 3000))
+
+    # Canned answers are served when a question is this similar (Jaccard) to a known phrasing
+    STATIC_ANSWER_THRESHOLD = float(os.environ.get('STATIC_ANSWER_THRESHOLD', 0.7))
+
+    # Prompt size budget (estimated tokens) for mentor chat, per model
+    PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', 8000))
+    PROMPT_TOKEN_BUDGETS = {
+        'gemini-1.0-pro': 6000,
+        'gemini-pro': 6000,
+    }
+    PROMPT_CONTEXT_SHARE = float(os.environ.get('PROMPT_CONTEXT_SHARE', 0.6))  # max share for document context
+
+    # Near-duplicate question cache (hashed n-gram vectors, cosine similarity)
+    SEMANTIC_CACHE_SIZE = int(os.environ.get('SEMANTIC_CACHE_SIZE', 2000))
+    SEMANTIC_CACHE_DIM = int(os.environ.get('SEMANTIC_CACHE_DIM', 1024))
+    SEMANTIC_CACHE_THRESHOLD = float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', 0.85))
+    SEMANTIC_CACHE_TTL = int(os.environ.get('SEMANTIC_CACHE_TTL', 24 * 60 * 60))  # seconds
+    SEMANTIC_CACHE_MIN_TOKENS = int(os.environ.get('SEMANTIC_CACHE_MIN_TOKENS', 3))
+    SEMANTIC_CACHE_MAX_TERM_DIFF = int(os.environ.get('SEMANTIC_CACHE_MAX_TERM_DIFF', 2))  # common words only
+
+    # Gemini clients pre-built at startup (comma separated)
+    GEMINI_WARM_MODELS = os.environ.get('GEMINI_WARM_MODELS', 'gemini-1.5-flash').split(',')
+
+    # Resolved model name cached on disk so new workers skip genai.list_models()
+    MODEL_CACHE_PATH = os.path.join(UPLOAD_FOLDER, 'gemini_model.json')
+    MODEL_CACHE_TTL = int(os.environ.get('MODEL_CACHE_TTL', 24 * 60 * 60))  # seconds
+    GEMINI_EAGER_WARMUP = os.environ.get('GEMINI_EAGER_WARMUP', '1') == '1'
+
+    # Max in-flight async Gemini calls per process
+    GEMINI_MAX_CONCURRENCY = int(os.environ.get('GEMINI_MAX_CONCURRENCY', 32))
+
+    # Client-side Gemini rate limiting, retries and circuit breaker
+    GEMINI_RPM = int(os.environ.get('GEMINI_RPM', 60))
+    GEMINI_TPM = int(os.environ.get('GEMINI_TPM', 1_000_000))
+    # Part of those limits reserved for bulk traffic (map-reduce over long documents), so chat keeps the rest
+    GEMINI_BULK_SHARE = float(os.environ.get('GEMINI_BULK_SHARE', 0.5))
+    GEMINI_MAX_RETRIES = int(os.environ.get('GEMINI_MAX_RETRIES', 3))
+    GEMINI_BACKOFF_BASE = float(os.environ.get('GEMINI_BACKOFF_BASE', 0.5))  # seconds
+    GEMINI_BACKOFF_MAX = float(os.environ.get('GEMINI_BACKOFF_MAX', 8.0))  # seconds
+    GEMINI_BREAKER_THRESHOLD = int(os.environ.get('GEMINI_BREAKER_THRESHOLD', 5))
+    GEMINI_BREAKER_COOLDOWN = float(os.environ.get('GEMINI_BREAKER_COOLDOWN', 30.0))  # seconds
+
+    # Background jobs for long document analyses
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+    JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 60 * 60))  # seconds
+    JOB_MAX_RETAINED = int(os.environ.get('JOB_MAX_RETAINED', 1000))
+
+    # Prometheus-format latency and cache metrics on /metrics
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
     
 
     if not os.path.exists(UPLOAD_FOLDER):